@@ -0,0 +1,158 @@
+"""
+Fills a SQLite database with random videos and times the tag, char and rating filters answered by
+the former EXISTS query with Video.tags.any(), the current SQL path and the bitmap index.
+
+    python -m bench.bitmap_filter [number of videos]
+"""
+import random
+import sys
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.sql import Select
+
+from bench.env import TEMP_DIR
+from christina.db import Base, engine, get_read_db_ctx
+from christina.db.migrations import migrate
+from christina.video import models, schemas
+from christina.video.bitmap import bitmap_index, count_bits, to_ids
+from christina.video.crud import select_videos
+
+TAGS = 200
+CHARS = 100
+PEOPLE = 500
+TAGS_PER_VIDEO = 5
+CHARS_PER_VIDEO = 2
+
+PAGE_SIZE = 30
+REPEAT = 20
+
+FILTERS = {
+    'OR': schemas.VideoFilter(tag=[1, 2, 3]),
+    'AND': schemas.VideoFilter(tag_all=[1, 2]),
+    'NOT': schemas.VideoFilter(tag=[1, 2], tag_none=[3]),
+    'AND+OR+NOT': schemas.VideoFilter(tag=[1, 2, 3, 4], char_all=[1], tag_none=[5]),
+    'rating+OR': schemas.VideoFilter(rating=[4, 5], tag=[1, 2]),
+}
+
+
+def fill(count: int):
+    random.seed(0)
+
+    with engine.begin() as connection:
+        connection.execute(insert(models.Person), [{'name': f'person {i}'} for i in range(PEOPLE)])
+        connection.execute(insert(models.Tag), [{'name': f'tag {i}'} for i in range(TAGS)])
+        connection.execute(insert(models.Character), [{'name': f'char {i}'} for i in range(CHARS)])
+
+        now = datetime.now()
+
+        connection.execute(insert(models.Video), [
+            {
+                'type': 'i',
+                'title': f'video {i}',
+                'rating': random.randint(0, 5),
+                'creator_id': random.randint(1, PEOPLE),
+                'created': now,
+                'deleted': True if random.random() < 0.02 else None,
+            }
+            for i in range(count)
+        ])
+
+        # popular tags are more likely, so the filters match a realistic share of the videos
+        weights = [1 / (i + 1) for i in range(TAGS)]
+
+        connection.execute(insert(models.video_tag_table), [
+            {'video_id': video_id, 'tag_id': tag_id}
+            for video_id in range(1, count + 1)
+            for tag_id in set(random.choices(range(1, TAGS + 1), weights, k=TAGS_PER_VIDEO))
+        ])
+
+        connection.execute(insert(models.video_char_table), [
+            {'video_id': video_id, 'char_id': char_id}
+            for video_id in range(1, count + 1)
+            for char_id in set(random.choices(range(1, CHARS + 1), k=CHARS_PER_VIDEO))
+        ])
+
+
+
+def select_with_any(filter: schemas.VideoFilter) -> Select:
+    """
+    The filters as they were queried before the bitmap index, with an EXISTS per condition.
+    """
+    stmt = select(models.Video.id).filter(models.Video.deleted == None)
+
+    if filter.rating:
+        stmt = stmt.filter(models.Video.rating.in_(filter.rating))
+
+    for relation, model, any_of, all_of, none_of in (
+            (models.Video.chars, models.Character, filter.char, filter.char_all, filter.char_none),
+            (models.Video.tags, models.Tag, filter.tag, filter.tag_all, filter.tag_none),
+    ):
+        if any_of:
+            stmt = stmt.filter(relation.any(model.id.in_(any_of)))
+
+        for id in all_of:
+            stmt = stmt.filter(relation.any(model.id == id))
+
+        if none_of:
+            stmt = stmt.filter(~relation.any(model.id.in_(none_of)))
+
+    return stmt
+
+
+def query_sql(stmt: Select) -> Tuple[int, List[int]]:
+    with get_read_db_ctx() as db:
+        total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+        ids = db.execute(stmt.order_by(models.Video.id).limit(PAGE_SIZE)).scalars().all()
+
+    return total, ids
+
+
+def query_bitmap(filter: schemas.VideoFilter) -> Tuple[int, List[int]]:
+    bitmap = bitmap_index.query(filter)
+
+    return count_bits(bitmap), to_ids(bitmap, limit=PAGE_SIZE)
+
+
+def measure(run: Callable[[], Tuple[int, List[int]]]) -> Tuple[float, Tuple[int, List[int]]]:
+    result = run()
+    start = perf_counter()
+
+    for _ in range(REPEAT):
+        run()
+
+    return (perf_counter() - start) / REPEAT * 1000, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    start = perf_counter()
+
+    # the search index is built in one go by the migrations, rather than by its triggers on every insert
+    Base.metadata.create_all(bind=engine)
+    fill(count)
+    migrate()
+
+    print(f'Filled {count} videos in {perf_counter() - start:.1f}s ({TEMP_DIR})')
+
+    start = perf_counter()
+    bitmap_index.build()
+    print(f'Built the bitmap index in {perf_counter() - start:.2f}s')
+
+    print(f'{"filter":<12} {"matched":>8} {"any()":>10} {"SQL":>10} {"bitmap":>10}   (ms per count + page)')
+
+    for name, filter in FILTERS.items():
+        any_ms, expected = measure(lambda: query_sql(select_with_any(filter)))
+        sql_ms, sql_result = measure(lambda: query_sql(select_videos(filter, models.Video.id)))
+        bitmap_ms, bitmap_result = measure(lambda: query_bitmap(filter))
+
+        assert sql_result == expected and bitmap_result == expected, name
+
+        print(f'{name:<12} {expected[0]:>8} {any_ms:>10.2f} {sql_ms:>10.2f} {bitmap_ms:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
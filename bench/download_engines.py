@@ -0,0 +1,108 @@
+"""
+Times the built-in HTTP engine, and aria2 if aria2c is installed, downloading the same file from a local server.
+
+    python -m bench.download_engines [size in MB]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import xmlrpc.client
+from pathlib import Path
+from threading import Event
+from time import sleep, time
+
+from bench.env import TEMP_DIR
+from christina.net.aria2 import Aria2Backend
+from christina.net.registry import Downloadable
+from christina.net.segmented import HTTPBackend
+from tests.file_server import FileServer
+
+ARIA2_PORT = 16800
+
+
+def bench_http(url: str, connections: int) -> float:
+    backend = HTTPBackend(Path(TEMP_DIR), connections=connections)
+
+    done = Event()
+    backend.on_notify = lambda gid: done.set()
+    backend.start()
+
+    start = time()
+    _, [gid] = backend.update([], [Downloadable(url=url, file=f'http-{connections}.bin', name='bench')])
+    done.wait()
+    elapsed = time() - start
+
+    [status], _ = backend.update([gid], [])
+    assert status['status'] == 'complete', status['errorMessage']
+
+    return elapsed
+
+
+def bench_aria2(url: str, connections: int) -> float:
+    process = subprocess.Popen([
+        'aria2c', '--enable-rpc', f'--rpc-listen-port={ARIA2_PORT}', f'--dir={TEMP_DIR}', '--quiet',
+        f'--split={connections}', f'--max-connection-per-server={connections}', '--min-split-size=1M',
+    ])
+
+    try:
+        rpc_url = f'http://127.0.0.1:{ARIA2_PORT}/rpc'
+
+        # wait for the RPC server to come up
+        for _ in range(50):
+            try:
+                xmlrpc.client.ServerProxy(rpc_url).aria2.getVersion()
+                break
+            except OSError:
+                sleep(0.1)
+
+        backend = Aria2Backend(Path(TEMP_DIR), rpc_url)
+
+        start = time()
+        _, [gid] = backend.update([], [Downloadable(url=url, file=f'aria2-{connections}.bin', name='bench')])
+
+        while True:
+            [status] = backend.tell_status([gid])
+
+            if status['status'] in ('complete', 'error', 'removed'):
+                break
+
+            sleep(0.01)
+
+        elapsed = time() - start
+
+        assert status['status'] == 'complete', status.get('errorMessage')
+
+        return elapsed
+
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+
+    server = FileServer(os.urandom(size * 1024 * 1024))
+    server.start()
+
+    engines = [('http', bench_http)]
+
+    if shutil.which('aria2c'):
+        engines.append(('aria2', bench_aria2))
+    else:
+        print('aria2c is not installed, skipping aria2')
+
+    print(f'{size} MB from {server.url}')
+
+    for name, bench in engines:
+        for connections in (1, 4):
+            elapsed = bench(server.url, connections)
+
+            print(f'{name:>6} x{connections}: {elapsed:.2f}s, {size / elapsed:.1f} MB/s')
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Points the modules at a throwaway database and directory, must be imported before anything from christina.
+"""
+import os
+import tempfile
+
+TEMP_DIR = tempfile.mkdtemp(prefix='christina-bench-')
+
+BENCH_ENV = {
+    'DB_URL': 'sqlite:///' + os.path.join(TEMP_DIR, 'bench.db'),
+    'STATIC_DIR': TEMP_DIR + '/',
+    'STATIC_SERVER': 'http://127.0.0.1/static/',
+    'ARIA2_RPC': 'http://127.0.0.1:6800/rpc',
+    'DOWNLOAD_BACKEND': 'http',
+    'PROXY': '',
+    'CORS_ORIGINS': '',
+}
+
+os.environ.update(BENCH_ENV)
+
+# christina.env loads .env with override
+import christina.env
+
+os.environ.update(BENCH_ENV)
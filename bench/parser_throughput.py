@@ -0,0 +1,103 @@
+"""
+Times the Iwara parser against the former Scrapy based one over the stored pages, and the cold imports of both.
+
+    python -m bench.parser_throughput [iterations]
+"""
+import re
+import subprocess
+import sys
+import urllib.parse
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, List
+
+from christina import utils
+from christina.video.parser import VideoInfo
+from christina.video.parsers import iwara
+
+FIXTURES = Path(__file__).parent.parent / 'tests' / 'fixtures'
+
+URL = 'https://ecchi.iwara.tv/videos/pk4kmf7vrecjd9qmo'
+
+
+def parse_with_scrapy(url: str, html: str) -> VideoInfo:
+    """
+    The parser before the registry, kept here as the baseline.
+    """
+    from scrapy.selector import Selector
+
+    selector = Selector(text=html)
+
+    title = selector.css('.node-info .title::text').get()
+    thumb_url = selector.css('#video-player::attr(poster)').get()
+    creator_url = selector.css('.node-info .username::attr(href)').get()
+    creator_name = selector.css('.node-info .username::text').get()
+    download_urls = selector.css('#download-options li:first-child a::attr(href)').getall()
+
+    download_url = next((link for link in download_urls if 'Source' in link), None)
+
+    if not download_url:
+        raise ValueError('Could not find download URL for Source resolution.')
+
+    file = urllib.parse.unquote(re.search(r'file=([^&]+)', download_url)[1])
+    filename = file[file.rindex('/') + 1:]
+
+    thumb_url = urllib.parse.urljoin(url, thumb_url)
+
+    return VideoInfo(
+        src_url=url,
+        url=urllib.parse.urljoin(url, download_url),
+        ext=utils.get_extension(filename),
+        title=title,
+        thumb_url=thumb_url,
+        thumb_ext=utils.get_extension(thumb_url),
+        uploaded_time=int(filename.split('_')[0]),
+        creator_name=creator_name,
+        creator_url=urllib.parse.urljoin(url, creator_url),
+    )
+
+
+def time_import(statement: str) -> float:
+    # in a fresh interpreter, as on a cold start
+    output = subprocess.check_output([
+        sys.executable, '-c', f'from time import perf_counter; t = perf_counter(); {statement}; print(perf_counter() - t)'
+    ])
+
+    return float(output)
+
+
+def time_parser(parse: Callable[[str, str], VideoInfo], pages: List[str], iterations: int) -> float:
+    start = perf_counter()
+
+    for _ in range(iterations):
+        for html in pages:
+            parse(URL, html)
+
+    return (perf_counter() - start) / (iterations * len(pages))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    pages = [path.read_text() for path in sorted(FIXTURES.glob('iwara_*.html'))]
+    size = sum(map(len, pages)) / len(pages)
+
+    # both must agree before their speeds mean anything
+    for html in pages:
+        assert iwara.parse(URL, html) == parse_with_scrapy(URL, html)
+
+    print(f'{len(pages)} pages of {size / 1024:.0f} KB on average, {iterations} iterations')
+
+    print(f'{"":<8} {"import ms":>10} {"parse ms":>10} {"pages/s":>10}')
+
+    for name, statement, parse in (
+            ('scrapy', 'import scrapy.selector', parse_with_scrapy),
+            ('lxml', 'import christina.video.parsers.iwara', iwara.parse),
+    ):
+        seconds = time_parser(parse, pages, iterations)
+
+        print(f'{name:<8} {time_import(statement) * 1000:>10.1f} {seconds * 1000:>10.3f} {1 / seconds:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
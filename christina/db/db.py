@@ -1,30 +1,103 @@
+import asyncio
 import os
+from concurrent.futures import Future
 from contextlib import contextmanager
 from datetime import datetime
+from queue import Queue, Empty
+from threading import Thread
+from time import time
+from typing import Callable, List, Tuple, Any
 
 from pydantic.json import ENCODERS_BY_TYPE
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
 
 from christina import utils
+from christina.logger import get_logger
 
 SQLALCHEMY_DATABASE_URL = os.environ['DB_URL']
 
+# number of read-only connections
+READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 8))
+
+# serve the hot routes with an async engine, requires aiosqlite
+DB_ASYNC = os.getenv('DB_ASYNC', '0') == '1'
+
+logger = get_logger(__name__)
+
 # override the default datetime encoder to return a numeric timestamp
 ENCODERS_BY_TYPE[datetime] = utils.timestamp
 
+connect_args = {
+    # may need to wait a while for a spun-down HDD to warm up (~6 sec),
+    # otherwise a "database is locked" error will occur after
+    # the default timeout (5 sec)
+    'timeout': 30,
+    "check_same_thread": False,
+}
+
+# there's only one connection for writing, so the writes are serialized here rather than by SQLite's locks
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={
-        # may need to wait a while for a spun-down HDD to warm up (~6 sec)
-        # or an Aria2 RPC request to respond (0-10 sec),
-        # otherwise a "database is locked" error will occur after
-        # the default timeout (5 sec)
-        'timeout': 30,
-        "check_same_thread": False,
-    }
+    SQLALCHEMY_DATABASE_URL, connect_args=connect_args, poolclass=QueuePool, pool_size=1, max_overflow=0,
+    pool_timeout=60,
 )
+
+read_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args=connect_args, poolclass=QueuePool, pool_size=READ_POOL_SIZE,
+    max_overflow=0, pool_timeout=60,
+)
+
+
+def set_pragmas(dbapi_connection, read_only: bool):
+    cursor = dbapi_connection.cursor()
+
+    # with WAL, readers are not blocked by the writer and vice versa
+    cursor.execute('PRAGMA journal_mode=WAL')
+
+    # safe enough with WAL, only the last transactions may be lost on a power failure
+    cursor.execute('PRAGMA synchronous=NORMAL')
+
+    # 64 MB of page cache, and memory mapped I/O to save the copies between kernel and user space
+    cursor.execute('PRAGMA cache_size=-65536')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+
+    if read_only:
+        cursor.execute('PRAGMA query_only=ON')
+
+    cursor.close()
+
+
+if SQLALCHEMY_DATABASE_URL.startswith('sqlite'):
+    event.listen(engine, 'connect', lambda dbapi_connection, record: set_pragmas(dbapi_connection, False))
+    event.listen(read_engine, 'connect', lambda dbapi_connection, record: set_pragmas(dbapi_connection, True))
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_read_engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL.replace('sqlite://', 'sqlite+aiosqlite://', 1),
+        connect_args=connect_args, poolclass=AsyncAdaptedQueuePool, pool_size=READ_POOL_SIZE, max_overflow=0,
+        pool_timeout=60,
+    )
+
+    event.listen(
+        async_read_engine.sync_engine, 'connect',
+        lambda dbapi_connection, record: set_pragmas(dbapi_connection, True)
+    )
+
+    # the objects are serialized after the session is closed, they must not be expired
+    AsyncReadSessionLocal = sessionmaker(
+        bind=async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -41,7 +114,103 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
 get_db_ctx = contextmanager(get_db)
+get_read_db_ctx = contextmanager(get_read_db)
+
+
+class Writer:
+    """
+    Runs write jobs in a dedicated thread. Jobs that arrive close together are committed in one transaction,
+    and a batch is flushed after max_delay at the latest.
+
+    When a batch fails, each of its jobs is run again by itself, so a job must not change anything but the database
+    and should hand what it has written to the caller through its result.
+    """
+
+    def __init__(self, max_batch: int = 100, max_delay: float = 0.01):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self.queue: Queue = Queue()
+
+        self.thread = Thread(name='DBWriter', target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, job: Callable[[Session], Any]) -> Future:
+        future = Future()
+        self.queue.put((job, future))
+        return future
+
+    def run(self):
+        while True:
+            jobs = [self.queue.get()]
+            deadline = time() + self.max_delay
+
+            while len(jobs) < self.max_batch:
+                timeout = deadline - time()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    jobs.append(self.queue.get(timeout=timeout))
+                except Empty:
+                    break
+
+            try:
+                self.run_batch(jobs)
+            except Exception:
+                if len(jobs) == 1:
+                    continue
+
+                # find out the failing ones by running them separately
+                for job in jobs:
+                    try:
+                        self.run_batch([job])
+                    except Exception:
+                        pass
+
+    @staticmethod
+    def run_batch(jobs: List[Tuple[Callable[[Session], Any], Future]]):
+        results = []
+
+        try:
+            with get_db_ctx() as db:
+                for job, future in jobs:
+                    results.append(job(db))
+
+        except Exception as e:
+            if len(jobs) == 1:
+                logger.exception(e)
+                jobs[0][1].set_exception(e)
+
+            raise
+
+        for (job, future), result in zip(jobs, results):
+            future.set_result(result)
+
+
+writer = Writer()
+
+
+async def write(job: Callable[[Session], Any]):
+    """
+    Awaits a write job without occupying a thread of the event loop's pool.
+    """
+    return await asyncio.wrap_future(writer.submit(job))
 
 
 class RecordNotFound(Exception):
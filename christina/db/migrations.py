@@ -0,0 +1,199 @@
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+from christina.logger import get_logger
+from .db import Base, engine, read_engine
+
+logger = get_logger(__name__)
+
+# a migration is either a list of SQL statements or a function receiving the connection
+Migration = Union[List[str], Callable[[Connection], None]]
+
+
+def index_videos(ids: str) -> List[str]:
+    """
+    Statements that rebuild the search index of the videos selected by given subquery or expression.
+    """
+    return [
+        f'DELETE FROM videos_fts WHERE rowid IN ({ids})',
+        f'''
+        INSERT INTO videos_fts (rowid, title, creator, tags, chars)
+        SELECT v.id, v.title,
+            (SELECT p.name FROM people p WHERE p.id = v.creator_id),
+            (SELECT group_concat(t.name || ' ' || ifnull(t.alias, ''), ' ')
+                FROM video_tag vt JOIN tags t ON t.id = vt.tag_id WHERE vt.video_id = v.id),
+            (SELECT group_concat(c.name || ' ' || ifnull(c.alias, ''), ' ')
+                FROM video_char vc JOIN chars c ON c.id = vc.char_id WHERE vc.video_id = v.id)
+        FROM videos v WHERE v.id IN ({ids}) AND v.deleted IS NULL
+        ''',
+    ]
+
+
+def merge_duplicates(table: str, link_table: str, key: str) -> List[str]:
+    """
+    Statements that merge the rows of given table sharing a name into the oldest of them, along with their videos.
+    """
+    # each duplicate with the id that survives it
+    duplicates = f'''
+        SELECT d.id, s.id AS survivor FROM {table} d
+        JOIN (SELECT name, min(id) AS id FROM {table} GROUP BY name) s ON s.name = d.name
+        WHERE d.id != s.id
+    '''
+
+    return [
+        f'''
+        INSERT OR IGNORE INTO {link_table} (video_id, {key})
+        SELECT l.video_id, d.survivor FROM {link_table} l JOIN ({duplicates}) d ON d.id = l.{key}
+        ''',
+        f'DELETE FROM {link_table} WHERE {key} IN (SELECT id FROM ({duplicates}))',
+
+        # keep an alias if only the duplicates have one
+        f'''
+        UPDATE {table} SET alias = (
+            SELECT d.alias FROM {table} d WHERE d.name = {table}.name AND d.alias IS NOT NULL ORDER BY d.id LIMIT 1
+        )
+        WHERE alias IS NULL AND id IN (SELECT survivor FROM ({duplicates}))
+        ''',
+        f'DELETE FROM {table} WHERE id IN (SELECT id FROM ({duplicates}))',
+    ]
+
+
+def trigger(name: str, event: str, ids: str) -> str:
+    body = ''.join(statement + ';' for statement in index_videos(ids))
+
+    return f'CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} BEGIN {body} END'
+
+
+# append only! the version of a database is the number of migrations applied to it,
+# stored in SQLite's user_version
+MIGRATIONS: List[Tuple[str, Migration]] = [
+    ('video indexes', [
+        # almost every query of videos excludes the deleted ones
+        'CREATE INDEX IF NOT EXISTS ix_videos_creator_id ON videos (creator_id) WHERE deleted IS NULL',
+        'CREATE INDEX IF NOT EXISTS ix_videos_rating ON videos (rating) WHERE deleted IS NULL',
+        'CREATE INDEX IF NOT EXISTS ix_videos_created ON videos (created) WHERE deleted IS NULL',
+        'CREATE INDEX IF NOT EXISTS ix_videos_uploaded ON videos (uploaded) WHERE deleted IS NULL',
+
+        # the candidates of random videos
+        'CREATE INDEX IF NOT EXISTS ix_videos_random ON videos (rating) '
+        'WHERE deleted IS NULL AND video_dl_id IS NULL AND thumb_dl_id IS NULL',
+
+        # the primary keys only cover the lookups by video
+        'CREATE INDEX IF NOT EXISTS ix_video_char_char_id ON video_char (char_id, video_id)',
+        'CREATE INDEX IF NOT EXISTS ix_video_tag_tag_id ON video_tag (tag_id, video_id)',
+    ]),
+    ('unique names', [
+        # already checked by the CRUD functions, the duplicates that slipped in before are merged
+        *merge_duplicates('chars', 'video_char', 'char_id'),
+        *merge_duplicates('tags', 'video_tag', 'tag_id'),
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_chars_name ON chars (name)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_tags_name ON tags (name)',
+    ]),
+    ('video search', [
+        # case and diacritics insensitive, with prefix indexes for searching as you type
+        "CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5("
+        "title, creator, tags, chars, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+
+        # a match in the title weighs the most
+        "INSERT INTO videos_fts (videos_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 2.0)')",
+
+        # keep the index in sync whoever writes to the tables
+        trigger('videos_fts_insert', 'INSERT ON videos', 'NEW.id'),
+        trigger('videos_fts_update', 'UPDATE OF title, creator_id, deleted ON videos', 'NEW.id'),
+        'CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN '
+        'DELETE FROM videos_fts WHERE rowid = OLD.id; END',
+        trigger('videos_fts_tag_insert', 'INSERT ON video_tag', 'NEW.video_id'),
+        trigger('videos_fts_tag_delete', 'DELETE ON video_tag', 'OLD.video_id'),
+        trigger('videos_fts_char_insert', 'INSERT ON video_char', 'NEW.video_id'),
+        trigger('videos_fts_char_delete', 'DELETE ON video_char', 'OLD.video_id'),
+        trigger('videos_fts_tags', 'UPDATE OF name, alias ON tags',
+                'SELECT video_id FROM video_tag WHERE tag_id = NEW.id'),
+        trigger('videos_fts_chars', 'UPDATE OF name, alias ON chars',
+                'SELECT video_id FROM video_char WHERE char_id = NEW.id'),
+        trigger('videos_fts_people', 'UPDATE OF name ON people',
+                'SELECT id FROM videos WHERE creator_id = NEW.id'),
+
+        *index_videos('SELECT id FROM videos'),
+    ]),
+    ('video sources', [
+        # the duplicates are looked up by their source URLs when importing
+        'CREATE INDEX IF NOT EXISTS ix_videos_src_url ON videos (src_url)',
+    ]),
+    ('video substring search', [
+        # the words of Japanese titles aren't separated by spaces, so the index is rebuilt to match any part of a text;
+        # the triggers refer to the table by name and keep working
+        'DROP TABLE IF EXISTS videos_fts',
+        "CREATE VIRTUAL TABLE videos_fts USING fts5(title, creator, tags, chars, tokenize='trigram')",
+        "INSERT INTO videos_fts (videos_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 2.0)')",
+
+        *index_videos('SELECT id FROM videos'),
+    ]),
+]
+
+
+def get_version(connection: Connection) -> int:
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate():
+    """
+    Creates the missing tables and applies the pending migrations, each in its own transaction.
+    All the models must have been imported before calling this.
+    """
+    # create_all() only creates what doesn't exist, so new tables don't need a migration
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        version = get_version(connection)
+
+    for index in range(version, len(MIGRATIONS)):
+        name, migration = MIGRATIONS[index]
+
+        logger.info(f'Applying migration #{index + 1}: {name}')
+
+        with engine.begin() as connection:
+            if callable(migration):
+                migration(connection)
+            else:
+                for statement in migration:
+                    connection.exec_driver_sql(statement)
+
+            # PRAGMA doesn't accept parameters
+            connection.exec_driver_sql(f'PRAGMA user_version = {index + 1}')
+
+    if version < len(MIGRATIONS):
+        with engine.begin() as connection:
+            # let the query planner know about the new indexes
+            connection.exec_driver_sql('ANALYZE')
+
+
+def explain(stmt: Select) -> List[str]:
+    """
+    Returns the query plan of a statement, one step per line.
+    """
+    sql = str(stmt.compile(bind=read_engine, compile_kwargs={'literal_binds': True}))
+
+    with read_engine.connect() as connection:
+        # the last column is the description of the step
+        return [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+
+
+def find_full_scans(stmt: Select, tables: List[str]) -> List[str]:
+    """
+    Returns the steps of the query plan that scan any of the given tables without an index.
+    """
+    full_scans = []
+
+    for step in explain(stmt):
+        words = step.split()
+
+        # "SCAN videos" or "SCAN TABLE videos" in older versions of SQLite
+        if words and words[0] == 'SCAN' and 'USING' not in words:
+            table = words[2] if words[1] == 'TABLE' else words[1]
+
+            if table in tables:
+                full_scans.append(step)
+
+    return full_scans
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import xmlrpc.client
+from pathlib import Path
+from threading import Thread
+from typing import Callable, List, Optional, Tuple, Union
+
+import websockets
+
+from christina.logger import get_logger
+from .backend import Backend, prepare_proxy
+from .registry import Downloadable
+from .rpc import RPCClient
+
+logger = get_logger(__name__)
+
+# https://aria2.github.io/manual/en/html/aria2c.html#notifications
+NOTIFICATIONS = [
+    'aria2.onDownloadStart',
+    'aria2.onDownloadPause',
+    'aria2.onDownloadStop',
+    'aria2.onDownloadComplete',
+    'aria2.onDownloadError',
+    'aria2.onBtDownloadComplete',
+]
+
+
+class Aria2Notifier:
+    """
+    Subscribes to the notifications sent by aria2 over its JSON-RPC WebSocket,
+    reconnecting forever when the socket drops.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            on_notify: Callable[[str, str], None],
+            on_connection_change: Callable[[bool], None],
+            retry_interval: float = 5,
+    ):
+        self.url = url
+        self.on_notify = on_notify
+        self.on_connection_change = on_connection_change
+        self.retry_interval = retry_interval
+
+        self.connected = False
+        self.error = ''
+
+        self.thread = Thread(name='Aria2Notifier', target=lambda: asyncio.run(self.run()), daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    async def run(self):
+        while True:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    logger.info('Connected to', self.url)
+
+                    self.error = ''
+                    self.set_connected(True)
+
+                    async for message in ws:
+                        self.handle_message(message)
+
+                raise ConnectionError('Connection closed.')
+
+            except Exception as e:
+                self.set_connected(False)
+
+                err = repr(e)
+
+                # only print a newly occurring error
+                if err != self.error:
+                    self.error = err
+                    logger.warn('Notification channel is down, falling back to polling:', err)
+
+            await asyncio.sleep(self.retry_interval)
+
+    def handle_message(self, message: str):
+        try:
+            data = json.loads(message)
+
+            # responses to method calls have no "method" field, they're never expected here though
+            method = data.get('method')
+
+            if method in NOTIFICATIONS:
+                for event in data.get('params', []):
+                    self.on_notify(method, event['gid'])
+
+        except Exception as e:
+            logger.error('Could not handle notification', message)
+            logger.exception(e)
+
+    def set_connected(self, connected: bool):
+        if connected != self.connected:
+            self.connected = connected
+            self.on_connection_change(connected)
+
+
+STATUS_KEYS = ['gid', 'status', 'totalLength', 'completedLength', 'downloadSpeed', 'errorMessage']
+
+
+class Aria2Backend(Backend):
+    name = 'aria2'
+
+    def __init__(self, download_dir: Path, rpc_url: str, ws_url: Optional[str] = None, timeout: float = 15):
+        super().__init__(download_dir)
+
+        self.rpc = RPCClient(rpc_url, timeout=timeout)
+
+        self.notifier = Aria2Notifier(
+            ws_url,
+            lambda method, gid: self.on_notify(gid),
+            lambda connected: self.on_connection_change(connected),
+        ) if ws_url else None
+
+    def start(self):
+        if self.notifier:
+            self.notifier.start()
+
+    @property
+    def push_mode(self) -> bool:
+        return bool(self.notifier and self.notifier.connected)
+
+    def update(
+            self,
+            gids: List[str],
+            targets: List[Downloadable],
+            speed_limit: int = 0,
+    ) -> Tuple[List[dict], List[Union[str, Exception]]]:
+        calls = [('aria2.tellStatus', [gid, STATUS_KEYS]) for gid in gids]
+
+        for target in targets:
+            options = {
+                'dir': str(self.download_dir),
+                'out': target.file,
+                'all-proxy': prepare_proxy(target),
+            }
+
+            if speed_limit:
+                options['max-download-limit'] = str(speed_limit)
+
+            calls.append(('aria2.addUri', [[target.url], options]))
+
+        results = self.rpc.multicall(calls)
+
+        statuses = [get_status(results, i, gid) for i, gid in enumerate(gids)]
+        added = []
+
+        for i in range(len(gids), len(calls)):
+            try:
+                added.append(results[i])
+            except xmlrpc.client.Fault as e:
+                added.append(e)
+
+        return statuses, added
+
+
+def get_status(results: xmlrpc.client.MultiCallIterator, index: int, gid: str) -> dict:
+    try:
+        status = results[index]
+
+        # an "id" field is more preferable
+        status['id'] = status['gid']
+        del status['gid']
+
+        return status
+
+    except xmlrpc.client.Fault as e:
+        # the gid is unknown to aria2, probably because aria2 has been restarted without saving its session
+        return {
+            'id': gid,
+            'status': 'removed',
+            'errorMessage': e.faultString,
+        }
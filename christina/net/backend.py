@@ -0,0 +1,63 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, List, Tuple, Union
+
+from christina.logger import get_logger
+from christina.tools.proxy import HTTP_PROXY
+from .registry import Downloadable
+
+logger = get_logger(__name__)
+
+
+class Backend(ABC):
+    """
+    An engine that performs the downloads. Statuses are reported in aria2's format, see ARIA2_STATES.
+    """
+
+    name = ''
+
+    def __init__(self, download_dir: Path):
+        self.download_dir = download_dir
+
+        # to be assigned by the downloader
+        self.on_notify: Callable[[str], None] = lambda gid: None
+        self.on_connection_change: Callable[[bool], None] = lambda connected: None
+
+    def start(self):
+        pass
+
+    @property
+    def push_mode(self) -> bool:
+        """
+        Whether the backend currently calls on_notify() when a download changes its status.
+        """
+        return False
+
+    @abstractmethod
+    def update(
+            self,
+            gids: List[str],
+            targets: List[Downloadable],
+            speed_limit: int = 0,
+    ) -> Tuple[List[dict], List[Union[str, Exception]]]:
+        """
+        Fetches the statuses of given downloads and adds new targets, in as few round-trips as possible.
+
+        :param speed_limit: Speed limit of each added download in bytes/sec, 0 means unlimited.
+        :returns: The statuses, and the gids of the added targets or the errors that prevented them from being added.
+        """
+
+    def tell_status(self, gids: List[str]) -> List[dict]:
+        return self.update(gids, [])[0]
+
+
+def prepare_proxy(target: Downloadable):
+    if target.use_proxy:
+        # never use proxy on local host...
+        if '127.0.0.1' not in target.url:
+            logger.info('Using proxy:', HTTP_PROXY)
+            return HTTP_PROXY
+
+        else:
+            logger.warn(f'Proxy is ignored for local host ({target.url})')
+            return None
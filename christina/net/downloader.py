@@ -1,115 +1,263 @@
 import os
-import xmlrpc.client
 from pathlib import Path
-from threading import Thread
-from time import sleep
-from typing import List
-
-from pydantic import BaseModel
+from threading import Thread, Event, Lock
+from time import sleep, time
+from typing import List, Set
 
 from christina import utils
 from christina.logger import get_logger
-from christina.tools.proxy import HTTP_PROXY
+from . import segmented, store
+from .aria2 import Aria2Backend
+from .backend import Backend, prepare_proxy
+from .metrics import Metrics
+from .pool import BackendPool, PoolMember
+from .registry import Downloadable, DownloadState, Registry, ARIA2_STATES
+from .scheduler import Scheduler
+from .segmented import HTTPBackend
 
 DOWNLOAD_DIR = Path(os.environ['STATIC_DIR'])
 
+# "aria2", or "http" to use the built-in engine on nodes without aria2
+DOWNLOAD_BACKEND = os.getenv('DOWNLOAD_BACKEND', 'aria2')
+
+# aria2's JSON-RPC WebSocket, e.g. ws://127.0.0.1:6800/jsonrpc, polling is used when not provided
+ARIA2_WS = os.getenv('ARIA2_WS')
+
+# multiple aria2 instances, one per line: <RPC URL> <download dir> [capacity] [WebSocket URL]
+# the download dirs should be inside STATIC_DIR so the files can be served
+ARIA2_POOL = list(filter(None, os.getenv('ARIA2_POOL', '').splitlines()))
+
+# even with notifications, fully refresh the status once in a while in case any of them got lost
+FULL_REFRESH_INTERVAL = 60
+
+# how long a status request keeps the active downloads being refreshed
+STATUS_REQUEST_TTL = 2
+
+# how often the speeds are sampled into the metrics' history
+METRICS_INTERVAL = 1
+
+# limits on the downloads that are added to the backend at the same time
+MAX_ACTIVE = int(os.getenv('DOWNLOAD_MAX_ACTIVE', 8))
+MAX_PER_HOST = int(os.getenv('DOWNLOAD_MAX_PER_HOST', 2))
+
+# overall download speed limit in bytes/sec, 0 means unlimited
+BANDWIDTH = int(os.getenv('DOWNLOAD_BANDWIDTH', 0))
+
 logger = get_logger(__name__)
 
 emitter = utils.EventEmitter()
 
+update_status_error = ''
 
-class Downloadable(BaseModel):
-    id: str = ''
-    url: str
-    file: str
-    name: str
-    use_proxy: bool = False
-    meta: dict = {}
+registry = Registry()
+scheduler = Scheduler(MAX_ACTIVE, MAX_PER_HOST, BANDWIDTH)
+metrics = Metrics()
 
+# targets that have not been persisted yet
+unsaved_targets: List[Downloadable] = []
 
-aria2_rpc = xmlrpc.client.ServerProxy(os.environ['ARIA2_RPC'], allow_none=True)
+# gids reported by the backend's notifications since the last update
+notified_gids: Set[str] = set()
+notified_gids_lock = Lock()
 
-aria2_status_keys = ['gid', 'status', 'totalLength', 'completedLength', 'downloadSpeed', 'errorMessage']
-update_status_error = ''
+wakeup = Event()
 
-pending_targets: List[Downloadable] = []
-downloads: List[dict] = []
+last_full_refresh = 0.0
+status_requested_at = 0.0
 
 
 def add(target: Downloadable):
     logger.info(f'Downloading "{target.url}" to "{target.file}"')
 
-    pending_targets.append(target)
+    unsaved_targets.append(target)
+    enqueue(target)
+
+
+def add_all(targets: List[Downloadable]):
+    """
+    Adds many targets at once, so they're persisted together and the loop is woken up only once.
+    """
+    for target in targets:
+        logger.info(f'Downloading "{target.url}" to "{target.file}"')
+
+    unsaved_targets.extend(targets)
+
+    for target in targets:
+        registry.add(target)
+        scheduler.push(target)
+
+    wakeup.set()
+
+
+def enqueue(target: Downloadable):
+    registry.add(target)
+    scheduler.push(target)
+    wakeup.set()
+
+
+def get_downloads() -> List[dict]:
+    return registry.get_statuses()
+
+
+def request_status():
+    """
+    Keeps the active downloads being refreshed for a while, should be called periodically by whoever displays them.
+    """
+    global status_requested_at
+
+    status_requested_at = time()
+    wakeup.set()
+
+
+def on_notify(gid: str):
+    with notified_gids_lock:
+        notified_gids.add(gid)
+
+    wakeup.set()
+
+
+def on_connection_change(connected: bool):
+    global last_full_refresh
+
+    # notifications may have been missed while disconnected
+    last_full_refresh = 0
+    wakeup.set()
+
+
+def create_backend() -> Backend:
+    if DOWNLOAD_BACKEND == 'http':
+        # seconds without a byte from the server before its connection is retried
+        return HTTPBackend(DOWNLOAD_DIR, timeout=float(os.getenv('DOWNLOAD_TIMEOUT', segmented.TIMEOUT)))
+
+    # aria2 may take a few seconds to respond when it's busy writing to disk
+    timeout = float(os.getenv('ARIA2_TIMEOUT', 15))
+
+    if ARIA2_POOL:
+        members = []
+
+        for line in ARIA2_POOL:
+            rpc_url, download_dir, *rest = line.split()
+            capacity = int(rest[0]) if rest else MAX_ACTIVE
+            ws_url = rest[1] if len(rest) > 1 else None
+
+            backend = Aria2Backend(Path(download_dir), rpc_url, ws_url, timeout=timeout)
+            members.append(PoolMember(backend, capacity, str(DOWNLOAD_DIR)))
+
+        return BackendPool(members)
+
+    return Aria2Backend(DOWNLOAD_DIR, os.environ['ARIA2_RPC'], ARIA2_WS, timeout=timeout)
+
+
+backend = create_backend()
+backend.on_notify = on_notify
+backend.on_connection_change = on_connection_change
+
+
+def push_mode() -> bool:
+    return backend.push_mode
+
+
+def status_requested() -> bool:
+    return time() - status_requested_at < STATUS_REQUEST_TTL
 
 
 def update_status():
-    global downloads, update_status_error
+    global update_status_error, last_full_refresh
 
     try:
-        if not len(pending_targets):
+        registry.drop_stale_statuses()
+
+        if not len(registry):
             return
 
-        multi_call = xmlrpc.client.MultiCall(aria2_rpc)
+        with notified_gids_lock:
+            gids = set(notified_gids)
+            notified_gids.clear()
 
-        registered, unregistered = [], []
+        full_refresh = not push_mode() or status_requested() or time() - last_full_refresh > FULL_REFRESH_INTERVAL
 
-        # split the targets into two lists
-        for target in pending_targets:
-            if target.id:
-                registered.append(target)
-            else:
-                unregistered.append(target)
+        if full_refresh:
+            last_full_refresh = time()
 
-        for target in registered:
-            multi_call.aria2.tellStatus(target.id, aria2_status_keys)
+            registered = registry.get_registered()
+        else:
+            # in push mode, only the downloads that the backend has told us about need to be checked
+            registered = list(filter(None, map(registry.get, gids)))
+
+        # persist the new targets before adding them, so they can be restored if we crash in the meantime
+        if len(unsaved_targets):
+            saving = unsaved_targets[:]
+            store.save(saving)
+            del unsaved_targets[:len(saving)]
+
+        unregistered = scheduler.release(registry.get_registered())
+
+        if not registered and not unregistered:
+            return
 
-        for target in unregistered:
-            multi_call.aria2.addUri([target.url], {
-                'dir': str(DOWNLOAD_DIR),
-                'out': target.file,
-                'all-proxy': prepare_proxy(target),
-            })
+        update_start = time()
 
-        results = list(multi_call())
-        registered_result = results[:len(registered)]
-        unregistered_result = results[len(registered):]
+        registered_result, added_result = backend.update(
+            [target.id for target in registered], unregistered, scheduler.get_speed_limit())
 
-        # save the fetched downloads
-        downloads = registered_result
+        metrics.record_update(registered_result, time() - update_start)
+
+        added_targets = []
+        failed_targets = []
 
         # bind gids to added targets
-        for i, gid in enumerate(unregistered_result):
-            logger.info('Download added', gid, unregistered[i].url)
+        for target, gid in zip(unregistered, added_result):
+            if isinstance(gid, Exception):
+                logger.warn('Could not add download', target.url, repr(gid))
+
+                registry.fail(target)
+                failed_targets.append(target)
+                continue
+
+            logger.info('Download added', gid, target.url)
 
-            unregistered[i].id = gid
+            registry.bind(target, gid)
+            added_targets.append(target)
 
-        if len(unregistered):
-            emitter.emit('added', unregistered)
+        if len(added_targets):
+            store.save(added_targets)
+            metrics.record_added(added_targets)
+            emitter.emit('added', added_targets)
 
         complete_targets = []
 
-        for download in downloads:
-            # an "id" field is more preferable
-            download['id'] = download['gid']
-            del download['gid']
+        for download in registered_result:
+            target = registry.update(download)
 
-            for target in pending_targets:
-                if download['status'] == 'complete' and download['id'] == target.id:
-                    logger.info('Downloaded', target.id, target.url)
+            if not target:
+                continue
 
-                    complete_targets.append(target)
-                    break
+            if target.state == DownloadState.COMPLETE:
+                logger.info('Downloaded', target.id, target.url)
 
-        if len(complete_targets):
-            for target in complete_targets:
-                pending_targets.remove(target)
+                registry.remove(target)
+                complete_targets.append(target)
+
+            elif target.state == DownloadState.ERROR:
+                logger.warn('Download failed', target.id, target.url, download.get('errorMessage', ''))
+
+                failed_targets.append(target)
 
+        store.save(failed_targets)
+        metrics.record_failed(failed_targets)
+
+        if len(complete_targets):
+            store.delete(complete_targets)
+            metrics.record_complete(complete_targets)
             emitter.emit('loaded', complete_targets)
 
         # clear the error
         update_status_error = ''
 
     except Exception as e:
+        # the notified gids have been consumed, make sure they'll be checked next time
+        last_full_refresh = 0
+
         err = repr(e)
 
         # only print a newly occurring error
@@ -118,23 +266,99 @@ def update_status():
             logger.exception(e)
 
 
-def prepare_proxy(target: Downloadable):
-    if target.use_proxy:
-        # never use proxy on local host...
-        if '127.0.0.1' not in target.url:
-            logger.info('Using proxy:', HTTP_PROXY)
-            return HTTP_PROXY
+def restore():
+    """
+    Restores the persisted targets and reconciles them with the backend in a single call. Downloads that are missing
+    in the backend will be added again, and those finished while we were down will be emitted as loaded.
+    """
+    targets = store.load()
 
-        else:
-            logger.warn(f'Proxy is ignored for local host ({target.url})')
-            return None
+    if not targets:
+        return
+
+    registered = [target for target in targets if target.id]
+    running, complete_targets, missing_targets = [], [], []
+
+    try:
+        statuses = backend.tell_status([target.id for target in registered])
+        statuses_by_gid = {status['id']: status for status in statuses}
+
+        for target in registered:
+            status = statuses_by_gid.get(target.id)
+
+            if not status:
+                # unknown, e.g. its pool member did not answer, leave it to the status updates
+                running.append(target)
+                continue
+
+            state = ARIA2_STATES.get(status['status'])
+
+            if state == DownloadState.COMPLETE:
+                complete_targets.append(target)
+            elif state in (DownloadState.ADDED, DownloadState.ACTIVE):
+                running.append(target)
+            else:
+                missing_targets.append(target)
+
+    except Exception as e:
+        # leave them to the status updates
+        logger.warn('Could not reconcile downloads with the backend, restoring them as is')
+        logger.exception(e)
+
+        running = registered
+
+    for target in missing_targets:
+        target.id = ''
+
+    running_ids = {id(target) for target in running}
+    complete_ids = {id(target) for target in complete_targets}
+
+    for target in targets:
+        if id(target) in running_ids:
+            registry.add(target)
+            registry.bind(target, target.id)
+            metrics.record_added([target])
+        elif id(target) not in complete_ids:
+            enqueue(target)
+
+    logger.info(f'Restored {len(targets)} downloads '
+                f'({len(running)} running, {len(complete_targets)} complete, {len(missing_targets)} re-added)')
+
+    store.save(missing_targets)
+
+    if len(complete_targets):
+        store.delete(complete_targets)
+        emitter.emit('loaded', complete_targets)
+
+    wakeup.set()
 
 
 def update_thread():
     while True:
+        wakeup.clear()
+
         update_status()
-        sleep(1)
+
+        if push_mode() and not status_requested():
+            # nothing to do until the backend or the user tells us something
+            wakeup.wait(FULL_REFRESH_INTERVAL)
+
+            # let more notifications and requests come in so they can be handled in one call
+            sleep(0.1)
+        else:
+            sleep(1)
+
+
+def metrics_thread():
+    while True:
+        sleep(METRICS_INTERVAL)
+
+        metrics.sample()
 
 
 thread = Thread(name='Downloader', target=update_thread, daemon=True)
 thread.start()
+
+Thread(name='DownloadMetrics', target=metrics_thread, daemon=True).start()
+
+backend.start()
@@ -0,0 +1,211 @@
+from array import array
+from threading import Lock
+from time import time
+from typing import Dict, List, Iterable
+
+from .registry import Downloadable
+
+# number of samples kept for the aggregate history, about 10 minutes when sampled every second
+HISTORY_SIZE = 600
+
+# number of samples kept for each download
+DOWNLOAD_HISTORY_SIZE = 60
+
+# number of recent completions and update latencies kept for the averages
+EVENT_HISTORY_SIZE = 200
+
+
+class RingBuffer:
+    """
+    A fixed-size buffer of numbers backed by an array, overwriting the oldest ones when full.
+    """
+
+    def __init__(self, size: int, typecode: str = 'd'):
+        self.data = array(typecode, [0]) * size
+        self.size = size
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value: float):
+        self.data[(self.start + self.count) % self.size] = value
+
+        if self.count < self.size:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.size
+
+    def values(self) -> List[float]:
+        end = self.start + self.count
+
+        if end <= self.size:
+            return self.data[self.start:end].tolist()
+
+        return self.data[self.start:].tolist() + self.data[:end - self.size].tolist()
+
+    def last(self, default: float = 0) -> float:
+        return self.data[(self.start + self.count - 1) % self.size] if self.count else default
+
+    def mean(self) -> float:
+        return sum(self.values()) / self.count if self.count else 0
+
+
+class DownloadSamples:
+    def __init__(self, proxied: bool):
+        self.proxied = proxied
+        self.added_at = time()
+        self.speed = RingBuffer(DOWNLOAD_HISTORY_SIZE, 'q')
+
+        # the latest status, sampled into the history by Metrics.sample()
+        self.current_speed = 0
+        self.completed = 0
+        self.total = 0
+
+
+class Metrics:
+    """
+    Keeps the history of download speeds and the counters of download events, so we can tell
+    whether a slowdown comes from the proxy, the backend or the disk.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+
+        self.times = RingBuffer(HISTORY_SIZE)
+        self.speeds = RingBuffer(HISTORY_SIZE, 'q')
+        self.proxied_speeds = RingBuffer(HISTORY_SIZE, 'q')
+        self.active_counts = RingBuffer(HISTORY_SIZE, 'l')
+
+        self.downloads: Dict[str, DownloadSamples] = {}
+
+        self.durations = RingBuffer(EVENT_HISTORY_SIZE)
+        self.update_latencies = RingBuffer(EVENT_HISTORY_SIZE)
+
+        self.added = 0
+        self.completed = 0
+        self.failed = 0
+        self.completed_bytes = 0
+
+    def record_added(self, targets: Iterable[Downloadable]):
+        with self.lock:
+            for target in targets:
+                self.downloads[target.id] = DownloadSamples(target.use_proxy)
+                self.added += 1
+
+    def record_update(self, statuses: List[dict], latency: float):
+        """
+        Keeps the latest statuses returned by the backend, full or partial, until the next sample.
+        """
+        with self.lock:
+            self.update_latencies.append(latency)
+
+            for status in statuses:
+                samples = self.downloads.get(status['id'])
+
+                if samples:
+                    samples.current_speed = int(status.get('downloadSpeed', 0))
+                    samples.completed = int(status.get('completedLength', 0))
+                    samples.total = int(status.get('totalLength', 0))
+
+    def sample(self):
+        """
+        Appends the latest speeds to the history. Called on a fixed interval so the samples are evenly spaced
+        whether the statuses are polled or pushed.
+        """
+        with self.lock:
+            speed = proxied_speed = active = 0
+
+            for samples in self.downloads.values():
+                samples.speed.append(samples.current_speed)
+
+                if samples.current_speed:
+                    active += 1
+                    speed += samples.current_speed
+
+                    if samples.proxied:
+                        proxied_speed += samples.current_speed
+
+            self.times.append(time())
+            self.speeds.append(speed)
+            self.proxied_speeds.append(proxied_speed)
+            self.active_counts.append(active)
+
+    def record_complete(self, targets: Iterable[Downloadable]):
+        with self.lock:
+            for target in targets:
+                samples = self.downloads.pop(target.id, None)
+
+                if samples:
+                    self.durations.append(time() - samples.added_at)
+                    self.completed_bytes += samples.total
+
+                self.completed += 1
+
+    def record_failed(self, targets: Iterable[Downloadable]):
+        with self.lock:
+            for target in targets:
+                self.downloads.pop(target.id, None)
+                self.failed += 1
+
+    def get_summary(self) -> dict:
+        with self.lock:
+            return {
+                'added': self.added,
+                'completed': self.completed,
+                'failed': self.failed,
+                'completed_bytes': self.completed_bytes,
+                'active': len(self.downloads),
+                'speed': int(self.speeds.last()),
+                'proxied_speed': int(self.proxied_speeds.last()),
+                'avg_duration': self.durations.mean(),
+                'avg_update_latency': self.update_latencies.mean(),
+            }
+
+    def get_history(self) -> dict:
+        with self.lock:
+            return {
+                'time': self.times.values(),
+                'speed': self.speeds.values(),
+                'proxied_speed': self.proxied_speeds.values(),
+                'active': self.active_counts.values(),
+                'downloads': {
+                    gid: {
+                        'speed': samples.speed.values(),
+                        'completed': samples.completed,
+                        'total': samples.total,
+                        'proxied': samples.proxied,
+                    }
+                    for gid, samples in self.downloads.items()
+                },
+            }
+
+
+def to_prometheus(summary: dict, queue: dict) -> str:
+    """
+    Formats the metrics in Prometheus' text exposition format.
+    """
+    metrics = [
+        ('christina_downloads_added_total', 'counter', summary['added']),
+        ('christina_downloads_completed_total', 'counter', summary['completed']),
+        ('christina_downloads_failed_total', 'counter', summary['failed']),
+        ('christina_downloaded_bytes_total', 'counter', summary['completed_bytes']),
+        ('christina_downloads_active', 'gauge', summary['active']),
+        ('christina_download_speed_bytes', 'gauge', summary['speed']),
+        ('christina_download_proxied_speed_bytes', 'gauge', summary['proxied_speed']),
+        ('christina_download_duration_seconds_avg', 'gauge', summary['avg_duration']),
+        ('christina_download_update_latency_seconds_avg', 'gauge', summary['avg_update_latency']),
+        ('christina_download_queue_depth', 'gauge', queue['queued']),
+        ('christina_download_queue_wait_seconds_avg', 'gauge', queue['avg_wait']),
+        ('christina_download_queue_wait_seconds_max', 'gauge', queue['max_wait']),
+        ('christina_download_queue_oldest_wait_seconds', 'gauge', queue['oldest_wait']),
+    ]
+
+    lines = []
+
+    for name, type, value in metrics:
+        lines.append(f'# TYPE {name} {type}')
+        lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Boolean, Integer, String, DateTime, JSON
+
+from christina.db import Base
+
+
+class DownloadRecord(Base):
+    __tablename__ = "downloads"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # gid in aria2, empty until the target is added
+    gid = Column(String)
+    state = Column(String, nullable=False)
+
+    url = Column(String, nullable=False)
+    file = Column(String, nullable=False)
+    dir = Column(String)
+    name = Column(String)
+    use_proxy = Column(Boolean, nullable=False)
+    meta = Column(JSON)
+    priority = Column(Integer, nullable=False, default=0)
+
+    created = Column(DateTime)
@@ -0,0 +1,191 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from christina.logger import get_logger
+from .backend import Backend
+from .registry import Downloadable, ARIA2_STATES, DownloadState
+
+logger = get_logger(__name__)
+
+# members with less free space than this will not get new targets, unless all of them are that full
+MIN_FREE_SPACE = 1024 ** 3
+
+# separates the index of the member from its own gid, e.g. "1-2089b05ecca3d829"
+GID_SEPARATOR = '-'
+
+
+class PoolMember:
+    def __init__(self, backend: Backend, capacity: int, static_dir: str):
+        self.backend = backend
+        self.capacity = capacity
+
+        # where the files are placed relative to the static directory
+        self.prefix = os.path.relpath(backend.download_dir, static_dir)
+
+        if self.prefix.startswith('..'):
+            logger.warn(f'{backend.download_dir} is outside {static_dir}, its files will not be served')
+
+        # gids of the unfinished downloads
+        self.active = set()
+
+    def get_load(self, pending: int = 0) -> float:
+        return (len(self.active) + pending) / self.capacity
+
+    def get_free_space(self) -> Optional[int]:
+        try:
+            return shutil.disk_usage(self.backend.download_dir).free
+        except OSError:
+            # probably a remote directory
+            return None
+
+
+class BackendPool(Backend):
+    """
+    Spreads the targets over multiple backends, each with its own download directory and capacity.
+    A target goes to the least loaded member that has enough free space.
+    """
+
+    name = 'pool'
+
+    def __init__(self, members: List[PoolMember]):
+        super().__init__(members[0].backend.download_dir)
+
+        self.members = members
+        self.executor = ThreadPoolExecutor(max_workers=len(members), thread_name_prefix='Pool')
+
+        for i, member in enumerate(members):
+            member.backend.on_notify = lambda gid, i=i: self.on_notify(self.to_pool_gid(i, gid))
+            member.backend.on_connection_change = lambda connected: self.on_connection_change(connected)
+
+    def start(self):
+        for member in self.members:
+            member.backend.start()
+
+    @property
+    def push_mode(self) -> bool:
+        return all(member.backend.push_mode for member in self.members)
+
+    @staticmethod
+    def to_pool_gid(index: int, gid: str) -> str:
+        return f'{index}{GID_SEPARATOR}{gid}'
+
+    @staticmethod
+    def from_pool_gid(pool_gid: str) -> Tuple[int, str]:
+        index, _, gid = pool_gid.partition(GID_SEPARATOR)
+
+        return (int(index), gid) if index.isdigit() else (-1, pool_gid)
+
+    def assign(self, targets: List[Downloadable], excluded: set) -> Dict[int, List[Downloadable]]:
+        candidates = [i for i in range(len(self.members)) if i not in excluded]
+
+        if not candidates:
+            return {}
+
+        spacious = []
+
+        for i in candidates:
+            free_space = self.members[i].get_free_space()
+
+            if free_space is None or free_space >= MIN_FREE_SPACE:
+                spacious.append(i)
+
+        candidates = spacious or candidates
+
+        # count the targets assigned in this round as their load
+        pending = {i: 0 for i in candidates}
+        assignments: Dict[int, List[Downloadable]] = {}
+
+        for target in targets:
+            best = min(candidates, key=lambda i: self.members[i].get_load(pending[i]))
+
+            pending[best] += 1
+            assignments.setdefault(best, []).append(target)
+
+        return assignments
+
+    def update(
+            self,
+            gids: List[str],
+            targets: List[Downloadable],
+            speed_limit: int = 0,
+    ) -> Tuple[List[dict], List[Union[str, Exception]]]:
+        statuses = []
+        gids_per_member: Dict[int, List[str]] = {}
+
+        for pool_gid in gids:
+            index, gid = self.from_pool_gid(pool_gid)
+
+            if 0 <= index < len(self.members):
+                gids_per_member.setdefault(index, []).append(gid)
+            else:
+                statuses.append({'id': pool_gid, 'status': 'removed', 'errorMessage': 'Unknown backend.'})
+
+        added: Dict[int, Union[str, Exception]] = {}
+        target_indices = {id(target): i for i, target in enumerate(targets)}
+
+        failed_members = set()
+        assignments = self.assign(targets, failed_members)
+
+        while gids_per_member or assignments:
+            indices = set(gids_per_member) | set(assignments)
+
+            futures = {
+                i: self.executor.submit(
+                    self.members[i].backend.update, gids_per_member.get(i, []), assignments.get(i, []), speed_limit
+                )
+                for i in indices
+            }
+
+            unassigned = []
+
+            for i, future in futures.items():
+                member = self.members[i]
+
+                try:
+                    member_statuses, member_added = future.result()
+
+                except Exception as e:
+                    # the statuses of its downloads will be fetched next time
+                    logger.warn(f'Backend #{i} failed:', repr(e))
+
+                    failed_members.add(i)
+                    unassigned += assignments.get(i, [])
+                    continue
+
+                for status in member_statuses:
+                    gid = status['id']
+                    status['id'] = self.to_pool_gid(i, gid)
+
+                    # also picks up the downloads restored after a restart
+                    if ARIA2_STATES.get(status['status']) in (DownloadState.COMPLETE, DownloadState.ERROR):
+                        member.active.discard(gid)
+                    else:
+                        member.active.add(gid)
+
+                    statuses.append(status)
+
+                for target, gid in zip(assignments.get(i, []), member_added):
+                    if isinstance(gid, Exception):
+                        added[target_indices[id(target)]] = gid
+                        continue
+
+                    member.active.add(gid)
+                    target.dir = '' if member.prefix == '.' else member.prefix
+
+                    added[target_indices[id(target)]] = self.to_pool_gid(i, gid)
+
+            # give the targets of failed members to the others
+            gids_per_member = {}
+            assignments = self.assign(unassigned, failed_members)
+
+            if not assignments:
+                for target in unassigned:
+                    added[target_indices[id(target)]] = ConnectionError('No backend is available.')
+
+        # in the order they were asked for, those of the failed members are left out
+        statuses_by_gid = {status['id']: status for status in statuses}
+        statuses = [statuses_by_gid[gid] for gid in gids if gid in statuses_by_gid]
+
+        return statuses, [added[i] for i in range(len(targets))]
@@ -0,0 +1,179 @@
+from enum import Enum
+from threading import RLock
+from typing import Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+
+class DownloadState(str, Enum):
+    QUEUED = 'queued'
+    ADDED = 'added'
+    ACTIVE = 'active'
+    COMPLETE = 'complete'
+    ERROR = 'error'
+
+
+# states that a target is allowed to move to from a given state
+TRANSITIONS = {
+    DownloadState.QUEUED: {DownloadState.ADDED, DownloadState.ERROR},
+    DownloadState.ADDED: {DownloadState.ACTIVE, DownloadState.COMPLETE, DownloadState.ERROR},
+    DownloadState.ACTIVE: {DownloadState.ADDED, DownloadState.COMPLETE, DownloadState.ERROR},
+    DownloadState.COMPLETE: set(),
+    DownloadState.ERROR: set(),
+}
+
+# maps aria2's statuses to ours, "waiting" and "paused" mean the download exists but is not running
+ARIA2_STATES = {
+    'active': DownloadState.ACTIVE,
+    'waiting': DownloadState.ADDED,
+    'paused': DownloadState.ADDED,
+    'complete': DownloadState.COMPLETE,
+    'error': DownloadState.ERROR,
+    'removed': DownloadState.ERROR,
+}
+
+
+class Downloadable(BaseModel):
+    id: str = ''
+    url: str
+    file: str
+    name: str
+    use_proxy: bool = False
+    meta: dict = {}
+    state: DownloadState = DownloadState.QUEUED
+
+    # see the PRIORITY_* constants in the scheduler
+    priority: int = 0
+
+    # directory relative to the static directory where the file is placed, assigned by the backend
+    dir: str = ''
+
+    # ID of the persisted record
+    record_id: Optional[int] = None
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+class Registry:
+    """
+    Keeps track of the targets with indices on their gids and video IDs, so that no lookup requires a scan.
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+
+        # insertion-ordered, the keys are object IDs because targets are not hashable
+        self.queued: Dict[int, Downloadable] = {}
+        self.by_gid: Dict[str, Downloadable] = {}
+        self.by_video: Dict[int, Dict[str, Downloadable]] = {}
+
+        # latest statuses of the downloads, keyed by gid
+        self.statuses: Dict[str, dict] = {}
+
+        # statuses of finished downloads, which will be shown once and dropped in the next update
+        self.stale_gids: Set[str] = set()
+
+    def __len__(self):
+        return len(self.queued) + len(self.by_gid)
+
+    def add(self, target: Downloadable):
+        with self.lock:
+            target.state = DownloadState.QUEUED
+            self.queued[id(target)] = target
+
+            if 'video_id' in target.meta:
+                self.by_video.setdefault(target.meta['video_id'], {})[target.meta.get('type', '')] = target
+
+    def get(self, gid: str) -> Optional[Downloadable]:
+        return self.by_gid.get(gid)
+
+    def find(self, video_id: int, type: Optional[str] = None) -> List[Downloadable]:
+        targets = self.by_video.get(video_id, {})
+
+        if type is not None:
+            return [targets[type]] if type in targets else []
+
+        return list(targets.values())
+
+    def get_queued(self) -> List[Downloadable]:
+        with self.lock:
+            return list(self.queued.values())
+
+    def get_registered(self) -> List[Downloadable]:
+        with self.lock:
+            return [target for target in self.by_gid.values() if target.state != DownloadState.ERROR]
+
+    def bind(self, target: Downloadable, gid: str):
+        with self.lock:
+            self.transit(target, DownloadState.ADDED)
+
+            target.id = gid
+
+            del self.queued[id(target)]
+            self.by_gid[gid] = target
+
+    def fail(self, target: Downloadable):
+        """
+        Marks a target that could not even be added as failed.
+        """
+        with self.lock:
+            self.transit(target, DownloadState.ERROR)
+            self.remove(target)
+
+    def update(self, status: dict) -> Optional[Downloadable]:
+        """
+        Saves a status fetched from aria2 and moves the related target to the corresponding state.
+
+        :returns: The target if its state has been changed.
+        """
+        with self.lock:
+            gid = status['id']
+
+            self.statuses[gid] = status
+
+            target = self.by_gid.get(gid)
+            state = ARIA2_STATES.get(status['status'])
+
+            if target and state and state != target.state:
+                self.transit(target, state)
+                return target
+
+            return None
+
+    def remove(self, target: Downloadable):
+        with self.lock:
+            self.queued.pop(id(target), None)
+
+            if target.id and self.by_gid.get(target.id) is target:
+                del self.by_gid[target.id]
+                self.stale_gids.add(target.id)
+
+            if 'video_id' in target.meta:
+                targets = self.by_video.get(target.meta['video_id'], {})
+                type = target.meta.get('type', '')
+
+                if targets.get(type) is target:
+                    del targets[type]
+
+                    if not targets:
+                        del self.by_video[target.meta['video_id']]
+
+    def drop_stale_statuses(self):
+        with self.lock:
+            for gid in self.stale_gids:
+                self.statuses.pop(gid, None)
+
+            self.stale_gids.clear()
+
+    def get_statuses(self) -> List[dict]:
+        with self.lock:
+            return list(self.statuses.values())
+
+    @staticmethod
+    def transit(target: Downloadable, state: DownloadState):
+        if state not in TRANSITIONS[target.state]:
+            raise InvalidTransition(f'{target.state.value} -> {state.value} ({target.url})')
+
+        target.state = state
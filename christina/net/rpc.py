@@ -0,0 +1,165 @@
+import asyncio
+import http.client
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+from queue import LifoQueue, Empty
+from threading import Lock
+from time import time
+from typing import List, Tuple, Any, Optional
+
+from christina.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Rejects calls for a while after consecutive failures, the rejection period doubles every time
+    the first call after it fails again.
+    """
+
+    def __init__(self, threshold: int = 3, backoff: float = 1, max_backoff: float = 60):
+        self.threshold = threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.failures = 0
+        self.opened_until = 0.0
+        self.current_backoff = backoff
+
+        self.lock = Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return time() < self.opened_until
+
+    def check(self):
+        if self.is_open:
+            raise CircuitOpenError(f'Circuit is open for another {self.opened_until - time():.1f}s')
+
+    def succeed(self):
+        with self.lock:
+            self.failures = 0
+            self.current_backoff = self.backoff
+
+    def fail(self):
+        with self.lock:
+            self.failures += 1
+
+            if self.failures >= self.threshold:
+                self.opened_until = time() + self.current_backoff
+
+                logger.warn(f'Circuit opened for {self.current_backoff}s after {self.failures} failures')
+
+                self.current_backoff = min(self.current_backoff * 2, self.max_backoff)
+
+
+class TimeoutTransport(xmlrpc.client.Transport):
+    """
+    A transport whose connections time out. The connection is kept alive between requests by the base class.
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        return conn
+
+
+class TimeoutSafeTransport(xmlrpc.client.SafeTransport):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        return conn
+
+
+class RPCClient:
+    """
+    A thread-safe XML-RPC client backed by a pool of keep-alive connections.
+    """
+
+    # errors meaning the server is unreachable or misbehaving, as opposed to a Fault which is a valid response
+    connection_errors = (OSError, http.client.HTTPException, xmlrpc.client.ProtocolError)
+
+    def __init__(self, url: str, timeout: float = 15, pool_size: int = 4, breaker: Optional[CircuitBreaker] = None):
+        self.url = url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+
+        self.pool: LifoQueue = LifoQueue()
+
+    def create_proxy(self) -> xmlrpc.client.ServerProxy:
+        transport_class = TimeoutSafeTransport if self.url.startswith('https') else TimeoutTransport
+
+        return xmlrpc.client.ServerProxy(self.url, transport=transport_class(self.timeout), allow_none=True)
+
+    def call(self, method: str, *params: Any):
+        self.breaker.check()
+
+        try:
+            proxy = self.pool.get_nowait()
+        except Empty:
+            proxy = self.create_proxy()
+
+        try:
+            result = getattr(proxy, method)(*params)
+
+        except xmlrpc.client.Fault:
+            self.breaker.succeed()
+            self.release(proxy)
+            raise
+
+        except self.connection_errors:
+            self.breaker.fail()
+
+            # the connection may be in a broken state
+            proxy('close')()
+            raise
+
+        self.breaker.succeed()
+        self.release(proxy)
+
+        return result
+
+    def multicall(self, calls: List[Tuple[str, list]]) -> xmlrpc.client.MultiCallIterator:
+        """
+        Sends the calls in a single request. Accessing the result of a failed call raises its Fault.
+        """
+        return xmlrpc.client.MultiCallIterator(
+            self.call('system.multicall', [{'methodName': method, 'params': params} for method, params in calls])
+        )
+
+    def release(self, proxy: xmlrpc.client.ServerProxy):
+        if self.pool.qsize() < self.pool_size:
+            self.pool.put(proxy)
+        else:
+            proxy('close')()
+
+
+class AsyncRPCClient:
+    """
+    Runs the calls of an RPCClient in a dedicated executor, so they can be awaited in the event loop
+    without occupying the default thread pool.
+    """
+
+    def __init__(self, client: RPCClient):
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=client.pool_size, thread_name_prefix='RPC')
+
+    async def call(self, method: str, *params: Any):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.client.call, method, *params)
+
+    async def multicall(self, calls: List[Tuple[str, list]]) -> xmlrpc.client.MultiCallIterator:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.client.multicall, calls)
@@ -0,0 +1,123 @@
+import heapq
+import itertools
+import urllib.parse
+from collections import deque
+from threading import Lock
+from time import time
+from typing import Dict, List, Iterable, Tuple, Optional
+
+from .registry import Downloadable
+
+# the larger, the earlier a target will be released
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 0
+PRIORITY_BULK = -1
+
+# how many recent wait times to keep for the stats
+WAIT_TIME_SAMPLES = 200
+
+
+def get_host(target: Downloadable) -> str:
+    return urllib.parse.urlsplit(target.url).hostname or ''
+
+
+def get_sort_key(target: Downloadable) -> Tuple[int, int]:
+    # thumbnails are tiny, they shouldn't wait behind multi-GB videos
+    return -target.priority, 0 if target.meta.get('type') == 'image' else 1
+
+
+class Scheduler:
+    """
+    Holds the targets locally and releases them by priority, without exceeding the global and per-host
+    concurrency limits. Each host has its own heap so a busy host never blocks the others.
+    """
+
+    def __init__(self, max_active: int, max_per_host: int, bandwidth: int = 0):
+        self.max_active = max_active
+        self.max_per_host = max_per_host
+
+        # overall download speed limit in bytes/sec, 0 means unlimited
+        self.bandwidth = bandwidth
+
+        self.heaps: Dict[str, List[Tuple[Tuple[int, int], int, Downloadable]]] = {}
+        self.queued_at: Dict[int, float] = {}
+
+        # keeps the insertion order among targets with the same sort key
+        self.counter = itertools.count()
+
+        self.wait_times = deque(maxlen=WAIT_TIME_SAMPLES)
+        self.released = 0
+
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.queued_at)
+
+    def push(self, target: Downloadable):
+        with self.lock:
+            heap = self.heaps.setdefault(get_host(target), [])
+            heapq.heappush(heap, (get_sort_key(target), next(self.counter), target))
+
+            self.queued_at[id(target)] = time()
+
+    def release(self, running: Iterable[Downloadable]) -> List[Downloadable]:
+        """
+        Pops the targets that can be started alongside the running ones.
+        """
+        with self.lock:
+            running_per_host: Dict[str, int] = {}
+
+            for target in running:
+                host = get_host(target)
+                running_per_host[host] = running_per_host.get(host, 0) + 1
+
+            slots = self.max_active - sum(running_per_host.values())
+            released = []
+
+            while slots > 0:
+                best_host: Optional[str] = None
+
+                for host, heap in self.heaps.items():
+                    if running_per_host.get(host, 0) < self.max_per_host \
+                            and (best_host is None or heap[0] < self.heaps[best_host][0]):
+                        best_host = host
+
+                if best_host is None:
+                    break
+
+                heap = self.heaps[best_host]
+                target = heapq.heappop(heap)[2]
+
+                if not heap:
+                    del self.heaps[best_host]
+
+                running_per_host[best_host] = running_per_host.get(best_host, 0) + 1
+                slots -= 1
+
+                self.wait_times.append(time() - self.queued_at.pop(id(target)))
+                self.released += 1
+
+                released.append(target)
+
+            return released
+
+    def get_speed_limit(self) -> int:
+        """
+        Speed limit of a released download. The bandwidth is evenly split among all the slots,
+        so the overall speed never exceeds it however many downloads are running.
+        """
+        return self.bandwidth // self.max_active
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            now = time()
+            wait_times = list(self.wait_times)
+
+            return {
+                'queued': len(self.queued_at),
+                'queued_per_host': {host: len(heap) for host, heap in self.heaps.items()},
+                'released': self.released,
+                'oldest_wait': now - min(self.queued_at.values()) if self.queued_at else 0,
+                'avg_wait': sum(wait_times) / len(wait_times) if wait_times else 0,
+                'max_wait': max(wait_times) if wait_times else 0,
+            }
@@ -0,0 +1,483 @@
+import asyncio
+import json
+import math
+import os
+import ssl
+import urllib.parse
+import uuid
+from pathlib import Path
+from threading import Thread
+from time import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from christina.logger import get_logger
+from .backend import Backend, prepare_proxy
+from .registry import Downloadable
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+SEGMENT_RETRIES = 3
+
+# don't bother splitting files smaller than this
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+
+# how often the progress of segments is saved, and the speed is sampled
+SAVE_INTERVAL = 1
+
+# default seconds to wait for connecting and for each read, a stalled server must not keep its download active forever
+TIMEOUT = 30
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0 Safari/537.36'
+
+
+class HTTPError(Exception):
+    pass
+
+
+async def wait(awaitable, timeout: float):
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        # retried like any other connection error
+        raise HTTPError(f'Timed out after {timeout} seconds.') from None
+
+
+class Response:
+    def __init__(self, status: int, headers: Dict[str, str], reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter, timeout: float):
+        self.status = status
+        self.headers = headers
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+
+    async def iter_chunks(self):
+        if 'chunked' in self.headers.get('transfer-encoding', ''):
+            while True:
+                size = int((await wait(self.reader.readline(), self.timeout)).split(b';')[0], 16)
+
+                if not size:
+                    break
+
+                yield await wait(self.reader.readexactly(size), self.timeout)
+
+                # the CRLF after each chunk
+                await wait(self.reader.readline(), self.timeout)
+
+        elif 'content-length' in self.headers:
+            remaining = int(self.headers['content-length'])
+
+            while remaining:
+                chunk = await wait(self.reader.read(min(CHUNK_SIZE, remaining)), self.timeout)
+
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+                yield chunk
+
+        else:
+            while True:
+                chunk = await wait(self.reader.read(CHUNK_SIZE), self.timeout)
+
+                if not chunk:
+                    break
+
+                yield chunk
+
+    def close(self):
+        self.writer.close()
+
+
+async def read_head(reader: asyncio.StreamReader, timeout: float) -> Tuple[int, Dict[str, str]]:
+    # e.g. HTTP/1.1 206 Partial Content
+    status_line = (await wait(reader.readline(), timeout)).decode('latin-1')
+
+    if not status_line:
+        raise HTTPError('Connection closed without a response.')
+
+    status = int(status_line.split()[1])
+    headers = {}
+
+    while True:
+        line = (await wait(reader.readline(), timeout)).decode('latin-1').strip()
+
+        if not line:
+            break
+
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    return status, headers
+
+
+async def request(url: str, headers: Dict[str, str], proxy: Optional[str], timeout: float) -> Response:
+    parts = urllib.parse.urlsplit(url)
+    https = parts.scheme == 'https'
+    port = parts.port or (443 if https else 80)
+    target = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+
+    if proxy:
+        proxy_parts = urllib.parse.urlsplit(proxy)
+        reader, writer = await wait(asyncio.open_connection(proxy_parts.hostname, proxy_parts.port or 80), timeout)
+
+        if https:
+            writer.write(f'CONNECT {parts.hostname}:{port} HTTP/1.1\r\nHost: {parts.hostname}:{port}\r\n\r\n'.encode())
+
+            status, _ = await read_head(reader, timeout)
+
+            if status != 200:
+                writer.close()
+                raise HTTPError(f'Proxy refused to connect (HTTP {status}).')
+
+            if not hasattr(writer, 'start_tls'):
+                writer.close()
+                raise HTTPError('HTTPS through a proxy requires Python 3.11+.')
+
+            await wait(writer.start_tls(ssl.create_default_context(), server_hostname=parts.hostname), timeout)
+        else:
+            # a plain HTTP proxy expects the absolute URL
+            target = url
+    else:
+        reader, writer = await wait(asyncio.open_connection(
+            parts.hostname, port, ssl=ssl.create_default_context() if https else None), timeout)
+
+    head = {
+        'Host': parts.netloc,
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': 'identity',
+        'Connection': 'close',
+        **headers,
+    }
+
+    writer.write((
+            f'GET {target} HTTP/1.1\r\n'
+            + ''.join(f'{name}: {value}\r\n' for name, value in head.items())
+            + '\r\n'
+    ).encode('latin-1'))
+
+    try:
+        status, response_headers = await read_head(reader, timeout)
+    except BaseException:
+        writer.close()
+        raise
+
+    return Response(status, response_headers, reader, writer, timeout)
+
+
+async def open_url(url: str, headers: Dict[str, str], proxy: Optional[str], timeout: float) -> Tuple[str, Response]:
+    """
+    Sends a GET request and follows the redirects.
+
+    :returns: The final URL and its response.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        response = await request(url, headers, proxy, timeout)
+
+        if response.status in (301, 302, 303, 307, 308) and 'location' in response.headers:
+            response.close()
+            url = urllib.parse.urljoin(url, response.headers['location'])
+            continue
+
+        return url, response
+
+    raise HTTPError('Too many redirects.')
+
+
+class HTTPDownload:
+    """
+    Downloads a file with multiple ranged connections. The progress of each segment is saved along with
+    the partial file so the download can be resumed after a restart.
+    """
+
+    def __init__(self, gid: str, url: str, path: Path, proxy: Optional[str], connections: int, speed_limit: int,
+                 timeout: float = TIMEOUT):
+        self.gid = gid
+        self.url = url
+        self.path = path
+        self.proxy = proxy
+        self.connections = connections
+        self.speed_limit = speed_limit
+        self.timeout = timeout
+
+        self.part_path = path.with_name(path.name + '.part')
+        self.control_path = path.with_name(path.name + '.part.json')
+
+        self.status = 'waiting'
+        self.error = ''
+        self.total = 0
+        self.completed = 0
+        self.speed = 0
+
+        # start, end (exclusive) and the downloaded length of each segment
+        self.segments: List[List[int]] = []
+
+        self.started_at = 0.0
+        self.started_completed = 0
+
+    def get_status(self) -> dict:
+        return {
+            'id': self.gid,
+            'status': self.status,
+            'totalLength': str(self.total),
+            'completedLength': str(self.completed),
+            'downloadSpeed': str(self.speed),
+            'errorMessage': self.error,
+        }
+
+    async def run(self):
+        self.status = 'active'
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            # probe the size and whether ranges are supported
+            url, response = await open_url(self.url, {'Range': 'bytes=0-'}, self.proxy, self.timeout)
+
+            content_range = response.headers.get('content-range', '')
+
+            if response.status == 206 and '/' in content_range and not content_range.endswith('*'):
+                response.close()
+
+                self.total = int(content_range.rsplit('/', 1)[1])
+
+                await self.download_segments(url)
+
+            elif response.status == 200:
+                self.total = int(response.headers.get('content-length', 0))
+
+                await self.download_stream(response)
+
+            else:
+                response.close()
+                raise HTTPError(f'HTTP {response.status}')
+
+            os.replace(self.part_path, self.path)
+
+            if self.control_path.exists():
+                self.control_path.unlink()
+
+            self.status = 'complete'
+
+        except Exception as e:
+            logger.warn('Download failed', self.gid, self.url, repr(e))
+
+            self.status = 'error'
+            self.error = repr(e)
+
+        finally:
+            self.speed = 0
+
+    async def download_stream(self, response: Response):
+        """
+        Downloads with the one and only connection, for servers that don't support ranges.
+        """
+        self.start_sampling()
+
+        ticker = asyncio.ensure_future(self.tick(save=False))
+
+        try:
+            with open(self.part_path, 'wb') as f:
+                async for chunk in response.iter_chunks():
+                    f.write(chunk)
+
+                    self.completed += len(chunk)
+                    await self.throttle()
+        finally:
+            ticker.cancel()
+            response.close()
+
+    async def download_segments(self, url: str):
+        self.segments = self.load_segments()
+        self.completed = sum(segment[2] for segment in self.segments)
+
+        self.start_sampling()
+
+        fd = os.open(self.part_path, os.O_RDWR | os.O_CREAT)
+        ticker = asyncio.ensure_future(self.tick(save=True))
+
+        try:
+            if os.fstat(fd).st_size != self.total:
+                os.ftruncate(fd, self.total)
+
+            tasks = [asyncio.ensure_future(self.download_segment(url, fd, segment)) for segment in self.segments]
+
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # stop the other connections before the file is closed
+                for task in tasks:
+                    task.cancel()
+
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        finally:
+            ticker.cancel()
+            self.save_segments()
+            os.close(fd)
+
+    async def download_segment(self, url: str, fd: int, segment: List[int]):
+        start, end = segment[0], segment[1]
+
+        for retry in range(SEGMENT_RETRIES + 1):
+            if start + segment[2] >= end:
+                return
+
+            try:
+                _, response = await open_url(
+                    url, {'Range': f'bytes={start + segment[2]}-{end - 1}'}, self.proxy, self.timeout)
+
+                try:
+                    if response.status != 206:
+                        raise HTTPError(f'Range request failed (HTTP {response.status})')
+
+                    async for chunk in response.iter_chunks():
+                        os.pwrite(fd, chunk, start + segment[2])
+
+                        segment[2] += len(chunk)
+                        self.completed += len(chunk)
+                        await self.throttle()
+                finally:
+                    response.close()
+
+                if start + segment[2] < end:
+                    raise HTTPError('Connection closed before the segment was complete.')
+
+            except (OSError, HTTPError, asyncio.IncompleteReadError) as e:
+                if retry == SEGMENT_RETRIES:
+                    raise
+
+                logger.warn(f'Retrying segment {start}-{end} of', self.gid, repr(e))
+
+                await asyncio.sleep(2 ** retry)
+
+    def load_segments(self) -> List[List[int]]:
+        try:
+            if self.part_path.exists():
+                with open(self.control_path) as f:
+                    control = json.load(f)
+
+                if control['total'] == self.total:
+                    logger.info('Resuming', self.gid, self.path)
+                    return control['segments']
+
+        except (OSError, ValueError, KeyError):
+            pass
+
+        count = max(1, min(self.connections, self.total // MIN_SEGMENT_SIZE))
+        size = max(1, math.ceil(self.total / count))
+
+        return [[start, min(start + size, self.total), 0] for start in range(0, self.total, size)]
+
+    def save_segments(self):
+        try:
+            with open(self.control_path, 'w') as f:
+                json.dump({'url': self.url, 'total': self.total, 'segments': self.segments}, f)
+
+        except OSError as e:
+            logger.warn('Could not save the progress of', self.gid, repr(e))
+
+    def start_sampling(self):
+        self.started_at = time()
+        self.started_completed = self.completed
+
+    async def tick(self, save: bool):
+        last_completed = self.completed
+
+        while True:
+            await asyncio.sleep(SAVE_INTERVAL)
+
+            self.speed = int((self.completed - last_completed) / SAVE_INTERVAL)
+            last_completed = self.completed
+
+            if save:
+                self.save_segments()
+
+    async def throttle(self):
+        if self.speed_limit:
+            expected = (self.completed - self.started_completed) / self.speed_limit
+            elapsed = time() - self.started_at
+
+            if expected > elapsed:
+                await asyncio.sleep(expected - elapsed)
+
+
+class HTTPBackend(Backend):
+    """
+    A pure-Python engine for nodes without aria2, running all the downloads in its own event loop.
+    """
+
+    name = 'http'
+
+    def __init__(self, download_dir: Path, connections: int = 4, timeout: float = TIMEOUT):
+        super().__init__(download_dir)
+
+        self.connections = connections
+        self.timeout = timeout
+        self.downloads: Dict[str, HTTPDownload] = {}
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(name='HTTPBackend', target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    @property
+    def push_mode(self) -> bool:
+        # every finished download is reported by itself
+        return True
+
+    def update(
+            self,
+            gids: List[str],
+            targets: List[Downloadable],
+            speed_limit: int = 0,
+    ) -> Tuple[List[dict], List[Union[str, Exception]]]:
+        statuses = []
+
+        for gid in gids:
+            download = self.downloads.get(gid)
+
+            if not download:
+                # we've probably been restarted, the partial file will be picked up when the target is added again
+                statuses.append({'id': gid, 'status': 'removed', 'errorMessage': 'Unknown download.'})
+                continue
+
+            statuses.append(download.get_status())
+
+            # the final status is reported only once
+            if download.status in ('complete', 'error'):
+                del self.downloads[gid]
+
+        added = []
+
+        for target in targets:
+            try:
+                gid = uuid.uuid4().hex[:16]
+
+                download = HTTPDownload(
+                    gid=gid,
+                    url=target.url,
+                    path=self.download_dir / target.file,
+                    proxy=prepare_proxy(target),
+                    connections=self.connections,
+                    speed_limit=speed_limit,
+                    timeout=self.timeout,
+                )
+
+                self.downloads[gid] = download
+                asyncio.run_coroutine_threadsafe(self.run(download), self.loop)
+
+                added.append(gid)
+
+            except Exception as e:
+                added.append(e)
+
+        return statuses, added
+
+    async def run(self, download: HTTPDownload):
+        await download.run()
+
+        self.on_notify(download.gid)
@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from christina.db import get_read_db_ctx, writer
+from .models import DownloadRecord
+from .registry import Downloadable, DownloadState
+
+
+def load() -> List[Downloadable]:
+    with get_read_db_ctx() as db:
+        records = db.query(DownloadRecord).order_by(DownloadRecord.id).all()
+
+        return [
+            Downloadable(
+                record_id=record.id,
+                id=record.gid or '',
+                url=record.url,
+                file=record.file,
+                dir=record.dir or '',
+                name=record.name or '',
+                use_proxy=record.use_proxy,
+                meta=record.meta or {},
+                priority=record.priority or 0,
+                state=DownloadState(record.state),
+            )
+            for record in records
+        ]
+
+
+def save(targets: List[Downloadable]):
+    """
+    Inserts the new targets and updates the gids and states of the saved ones.
+    """
+    if not targets:
+        return
+
+    new_targets = [target for target in targets if target.record_id is None]
+
+    def save_records(db: Session) -> List[int]:
+        records = [
+            DownloadRecord(
+                gid=target.id or None,
+                state=target.state.value,
+                url=target.url,
+                file=target.file,
+                dir=target.dir,
+                name=target.name,
+                use_proxy=target.use_proxy,
+                meta=target.meta,
+                priority=target.priority,
+                created=datetime.now(),
+            )
+            for target in new_targets
+        ]
+
+        db.add_all(records)
+
+        db.bulk_update_mappings(DownloadRecord, [
+            {
+                'id': target.record_id,
+                'gid': target.id or None,
+                'state': target.state.value,
+                'dir': target.dir,
+            }
+            for target in targets if target.record_id is not None
+        ])
+
+        db.flush()
+
+        return [record.id for record in records]
+
+    # assigned only once committed, the job is run again if another one in its batch fails
+    for target, record_id in zip(new_targets, writer.submit(save_records).result()):
+        target.record_id = record_id
+
+
+def delete(targets: List[Downloadable]):
+    ids = [target.record_id for target in targets if target.record_id is not None]
+
+    if not ids:
+        return
+
+    def delete_records(db: Session):
+        db.query(DownloadRecord).filter(DownloadRecord.id.in_(ids)).delete(synchronize_session=False)
+
+    writer.submit(delete_records).result()
@@ -1,11 +1,12 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
-from christina.db import get_db
+from christina.db import get_db, get_read_db
 from christina.logger import get_logger
 from christina.video import crud, schemas
+from ..utils import json_response
 
 logger = get_logger(__name__)
 
@@ -13,8 +14,8 @@ router = APIRouter(prefix='/chars')
 
 
 @router.get('', response_model=List[schemas.Character])
-def route_chars(db: Session = Depends(get_db)):
-    return crud.get_chars(db)
+def route_chars(request: Request, db: Session = Depends(get_read_db)):
+    return json_response(request, *crud.get_catalog(db, 'chars'))
 
 
 @router.post('', status_code=201, response_model=schemas.Character)
@@ -27,6 +28,12 @@ def route_add_char(source: schemas.CharacterCreate, db: Session = Depends(get_db
     return db_char
 
 
+@router.patch('/videos', response_model=List[schemas.BulkResult])
+def route_update_video_chars(update: schemas.VideoLinksUpdate, db: Session = Depends(get_db)):
+    # all or nothing, in the transaction of the request
+    return crud.update_video_links(db, 'char', update.video_ids, update.add, update.remove)
+
+
 @router.post('/{char_id}/videos/{video_id}', status_code=200)
 def route_add_char(char_id: int, video_id: int, db: Session = Depends(get_db)):
     crud.add_video_char(db, char_id=char_id, video_id=video_id)
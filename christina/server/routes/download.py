@@ -1,11 +1,13 @@
 import asyncio
-from typing import List
+from typing import List, Dict, Optional
 
-from fastapi import APIRouter, WebSocket
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from websockets.exceptions import ConnectionClosed
 
 from christina.logger import get_logger
 from christina.net import downloader
+from christina.net.metrics import to_prometheus
 from ..utils import ConnectionManager
 
 download_ws_manager = ConnectionManager()
@@ -15,19 +17,115 @@ router = APIRouter(prefix='/download')
 logger = get_logger(__name__)
 
 
+@router.get('/queue')
+def route_queue():
+    return downloader.scheduler.get_stats()
+
+
+@router.get('/metrics')
+def route_metrics(history: bool = False):
+    return {
+        **downloader.metrics.get_summary(),
+        'queue': downloader.scheduler.get_stats(),
+        'websocket': download_ws_manager.get_stats(),
+        'history': downloader.metrics.get_history() if history else None,
+    }
+
+
+@router.get('/metrics/prometheus', response_class=PlainTextResponse)
+def route_prometheus_metrics():
+    return to_prometheus(downloader.metrics.get_summary(), downloader.scheduler.get_stats())
+
+
+class StatusFeed:
+    """
+    Polls the downloads once for all the subscribers and broadcasts only what has changed since the last time.
+    """
+
+    def __init__(self):
+        self.snapshot: Dict[str, dict] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self.task:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        while True:
+            try:
+                if download_ws_manager.active_connections:
+                    downloader.request_status()
+
+                    await self.update()
+            except Exception as e:
+                logger.error('Could not update the status feed.')
+                logger.exception(e)
+
+            await asyncio.sleep(1)
+
+    async def update(self):
+        current = {download['id']: download for download in downloader.get_downloads()}
+
+        changed = [download for id, download in current.items() if self.snapshot.get(id) != download]
+        removed = [id for id in self.snapshot if id not in current]
+
+        self.snapshot = current
+
+        if changed or removed:
+            await download_ws_manager.broadcast_async({
+                'type': 'status-delta',
+                'data': {
+                    'changed': changed,
+                    'removed': removed,
+                }
+            })
+
+
+status_feed = StatusFeed()
+
+
+def merge_status_deltas(pending: dict, new: dict) -> dict:
+    changed = {download['id']: download for download in pending['data']['changed']}
+    removed = set(pending['data']['removed'])
+
+    for id in new['data']['removed']:
+        changed.pop(id, None)
+        removed.add(id)
+
+    for download in new['data']['changed']:
+        changed[download['id']] = download
+        removed.discard(download['id'])
+
+    return {
+        'type': 'status-delta',
+        'data': {
+            'changed': list(changed.values()),
+            'removed': list(removed),
+        }
+    }
+
+
+download_ws_manager.coalesce('status-delta', merge_status_deltas)
+
+
 @router.websocket('/download/')
 async def ws_tasks(websocket: WebSocket):
     await download_ws_manager.connect(websocket)
 
+    status_feed.start()
+
+    # the full snapshot goes only to the new client, then the deltas will follow
+    download_ws_manager.send(websocket, {
+        'type': 'status',
+        'data': list(status_feed.snapshot.values())
+    })
+
     try:
         while True:
-            await websocket.send_json({
-                'type': 'status',
-                'data': downloader.downloads
-            })
-            await asyncio.sleep(1)
+            # nothing is expected from the client, just wait until it leaves
+            await websocket.receive_text()
 
-    except ConnectionClosed:
+    except (ConnectionClosed, WebSocketDisconnect):
         download_ws_manager.disconnect(websocket)
 
 
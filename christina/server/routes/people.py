@@ -1,11 +1,12 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
-from christina.db import get_db
+from christina.db import get_read_db
 from christina.logger import get_logger
 from christina.video import crud, schemas
+from ..utils import json_response
 
 logger = get_logger(__name__)
 
@@ -13,5 +14,5 @@ router = APIRouter(prefix='/people')
 
 
 @router.get('', response_model=List[schemas.Person])
-def route_people(db: Session = Depends(get_db)):
-    return crud.get_people(db)
+def route_people(request: Request, db: Session = Depends(get_read_db)):
+    return json_response(request, *crud.get_catalog(db, 'people'))
@@ -1,11 +1,12 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
-from christina.db import get_db
+from christina.db import get_db, get_read_db
 from christina.logger import get_logger
 from christina.video import crud, schemas
+from ..utils import json_response
 
 logger = get_logger(__name__)
 
@@ -13,8 +14,8 @@ router = APIRouter(prefix='/tags')
 
 
 @router.get('', response_model=List[schemas.Tag])
-def route_tags(db: Session = Depends(get_db)):
-    return crud.get_tags(db)
+def route_tags(request: Request, db: Session = Depends(get_read_db)):
+    return json_response(request, *crud.get_catalog(db, 'tags'))
 
 
 @router.post('', status_code=201, response_model=schemas.Tag)
@@ -27,6 +28,12 @@ def route_add_tag(source: schemas.TagCreate, db: Session = Depends(get_db)):
     return db_tag
 
 
+@router.patch('/videos', response_model=List[schemas.BulkResult])
+def route_update_video_tags(update: schemas.VideoLinksUpdate, db: Session = Depends(get_db)):
+    # all or nothing, in the transaction of the request
+    return crud.update_video_links(db, 'tag', update.video_ids, update.add, update.remove)
+
+
 @router.post('/{tag_id}/videos/{video_id}', status_code=200)
 def route_add_tag(tag_id: int, video_id: int, db: Session = Depends(get_db)):
     crud.add_video_tag(db, tag_id=tag_id, video_id=video_id)
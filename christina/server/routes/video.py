@@ -1,18 +1,20 @@
-from datetime import datetime
-from typing import Optional, List, Callable
+import os
+from concurrent.futures import Future
+from typing import Optional, List, Callable, Set
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from christina import utils
-from christina.db import engine, get_db, get_db_ctx
-from christina.env import DEV_MODE
+from christina.db import get_db, get_read_db, writer, RecordNotFound
 from christina.logger import get_logger
 from christina.net import downloader, static
-from christina.video import parser, crud, models, schemas, tools
-
-models.Base.metadata.create_all(bind=engine)
+from christina.video import parser, crud, schemas, tools
+from christina.video.cache import catalog
+from christina.video.importer import add_video, importer
+from christina.video.serialize import serialize_video_list, parse_fields
+from ..utils import etag_matches, not_modified, set_etag
 
 logger = get_logger(__name__)
 
@@ -23,59 +25,173 @@ class ThumbUpdate(BaseModel):
     time: float
 
 
-@router.get('', response_model=schemas.VideoList)
-def route_videos(
+def parse_ids(ids: Optional[str]) -> List[int]:
+    # the ids can be an array like "1,2,3"
+    if not ids:
+        return []
+
+    try:
+        return list(map(int, ids.split(',')))
+    except ValueError:
+        raise HTTPException(400, f'Invalid IDs: {ids}')
+
+
+def get_batch_ids(ids: Optional[str] = None) -> List[int]:
+    batch_ids = parse_ids(ids)
+
+    if len(batch_ids) > crud.MAX_BATCH_SIZE:
+        raise HTTPException(400, f'Too many IDs, at most {crud.MAX_BATCH_SIZE} are allowed.')
+
+    return batch_ids
+
+
+def get_fields(fields: Optional[str] = None) -> Optional[Set[str]]:
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def get_video_filter(
         search: Optional[str] = None,
         creator: Optional[int] = None,
+        rating: Optional[str] = None,
         char: Optional[str] = None,
+        char_all: Optional[str] = None,
+        char_none: Optional[str] = None,
         tag: Optional[str] = None,
+        tag_all: Optional[str] = None,
+        tag_none: Optional[str] = None,
+) -> schemas.VideoFilter:
+    return schemas.VideoFilter(
+        search=search,
+        creator_id=creator,
+        rating=parse_ids(rating),
+        char=parse_ids(char),
+        char_all=parse_ids(char_all),
+        char_none=parse_ids(char_none),
+        tag=parse_ids(tag),
+        tag_all=parse_ids(tag_all),
+        tag_none=parse_ids(tag_none),
+    )
+
+
+@router.get('', response_model=schemas.VideoList)
+def route_videos(
+        request: Request,
+        filter: schemas.VideoFilter = Depends(get_video_filter),
         offset: int = 0,
         limit: int = 100,
         order: str = '',
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = None,
+        ids: List[int] = Depends(get_batch_ids),
+        field_names: Optional[Set[str]] = Depends(get_fields),
+        db: Session = Depends(get_read_db)
 ):
-    # the char and tag can be an array like "1,2,3"
-    if char:
-        if ',' in char:
-            char = map(int, char.split(','))
-        else:
-            char = int(char)
-
-    if tag:
-        if ',' in tag:
-            tag = map(int, tag.split(','))
-        else:
-            tag = int(tag)
-
-    videos, total = crud.get_videos(
-        db,
-        search=search,
-        creator_id=creator,
-        char=char,
-        tag=tag,
-        offset=offset,
-        limit=limit,
-        order=order
+    # versions are checked before touching the database
+    etag = catalog.get_list_etag()
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if ids:
+        # batch mode, the filter and the page are ignored
+        videos = crud.get_videos_by_ids(db, ids, field_names)
+        total, next_cursor = len(videos), None
+    else:
+        try:
+            videos, total, next_cursor = crud.get_videos(
+                db,
+                filter,
+                offset=offset,
+                limit=limit,
+                order=order,
+                cursor=cursor,
+                fields=field_names
+            )
+        except ValueError as e:
+            # an invalid order or cursor
+            raise HTTPException(400, str(e))
+
+    # skip the validation of pydantic, which dominates the time of large lists
+    response = Response(
+        serialize_video_list(videos, total, next_cursor, field_names),
+        media_type='application/json'
     )
+    set_etag(response, etag)
 
-    return {
-        'list': videos,
-        'total': total
-    }
+    return response
+
+
+@router.patch('', response_model=List[schemas.BulkResult])
+def route_update_videos(update: schemas.VideoBulkUpdate, db: Session = Depends(get_db)):
+    return crud.update_videos(db, update.ids, update.update.dict(exclude_unset=True))
+
+
+@router.get('/facets', response_model=schemas.VideoFacets)
+def route_video_facets(
+        request: Request,
+        response: Response,
+        filter: schemas.VideoFilter = Depends(get_video_filter),
+        db: Session = Depends(get_read_db)
+):
+    etag = catalog.get_list_etag()
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+
+    return crud.get_facets(db, filter)
 
 
 @router.get('/random', response_model=schemas.Video)
-def route_random_video(exclude: Optional[int], rating: Optional[int] = None, db: Session = Depends(get_db)):
+def route_random_video(exclude: Optional[int], rating: Optional[int] = None, db: Session = Depends(get_read_db)):
     return crud.get_random_video(db, exclude, rating)
 
 
+@router.post('/shuffle', response_model=schemas.ShuffleSession)
+def route_create_shuffle(rating: Optional[int] = None, db: Session = Depends(get_read_db)):
+    return crud.create_shuffle(db, rating)
+
+
+@router.get('/shuffle/{session}', response_model=schemas.Video)
+def route_shuffled_video(session: str, db: Session = Depends(get_read_db)):
+    try:
+        return crud.get_shuffled_video(db, session)
+    except RecordNotFound:
+        raise HTTPException(404, 'Shuffle session has expired.')
+
+
+@router.post('/import', status_code=202, response_model=schemas.ImportJob)
+def route_import_videos(body: schemas.VideoImport):
+    return importer.start(body.sources)
+
+
+@router.get('/import/{job_id}', response_model=schemas.ImportJob)
+def route_import_job(job_id: str):
+    job = importer.get(job_id)
+
+    if not job:
+        raise HTTPException(404, 'Import job not found.')
+
+    return job
+
+
 @router.get('/{id}', response_model=schemas.Video)
-def route_video(id: int, db: Session = Depends(get_db)):
+def route_video(id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    etag = catalog.get_video_etag(id)
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+
     return crud.get_video(db, id)
 
 
 @router.put('/{id}/thumb')
-def route_thumb(id: int, update: ThumbUpdate, db: Session = Depends(get_db)):
+def route_thumb(id: int, update: ThumbUpdate, db: Session = Depends(get_read_db)):
     video = crud.get_video(db, id)
     video_file = static.static_file(video.file)
     thumb_file = static.static_file(video.thumb_file)
@@ -99,60 +215,10 @@ def route_delete_video(id: int, db: Session = Depends(get_db)):
 def route_add_video(source: schemas.VideoCreate, db: Session = Depends(get_db)):
     info = parser.parse_video_source(source)
 
-    creator_id = None
+    db_video, targets = add_video(db, source.type, info)
 
-    if info.creator_name:
-        person = crud.find_or_create_person(db, name=info.creator_name, url=info.creator_url)
-
-        creator_id = person.id
-
-    video = schemas.VideoBase(
-        type=source.type,
-        creator_id=creator_id,
-        src_url=info.src_url,
-        title=info.title,
-        uploaded=datetime.fromtimestamp(info.uploaded_time),
-        video_dl_url=info.url,
-        thumb_dl_url=info.thumb_url,
-    )
-
-    db_video = crud.create_video(db, video)
-
-    file = tools.get_video_file(db_video, info.ext)
-    thumb_file = tools.get_thumb_file(db_video, info.thumb_ext)
-
-    crud.update_video(db, db_video, {
-        'file': file,
-        'thumb_file': thumb_file,
-    })
-
-    video_dl_target = downloader.Downloadable(
-        url=video.video_dl_url,
-        file=file,
-        name=video.title,
-        use_proxy=True,
-        meta={
-            'video_id': db_video.id,
-            'type': 'video'
-        }
-    )
-    thumb_dl_target = downloader.Downloadable(
-        url=video.thumb_dl_url,
-        file=thumb_file,
-        name=video.title,
-        use_proxy=True,
-        meta={
-            'video_id': db_video.id,
-            'type': 'image'
-        }
-    )
-
-    if DEV_MODE:
-        video_dl_target.url = 'http://127.0.0.1/test.mp4'
-        thumb_dl_target.url = 'http://127.0.0.1/test.jpg'
-
-    downloader.add(video_dl_target)
-    downloader.add(thumb_dl_target)
+    for target in targets:
+        downloader.add(target)
 
     return db_video
 
@@ -168,10 +234,15 @@ def on_loaded(targets: List[downloader.Downloadable]):
 
 
 def save_dl_id(target: downloader.Downloadable):
+    # the backend may have placed the file in another directory
+    file = os.path.join(target.dir, target.file)
+
     return {
         'video_dl_id': target.id,
+        'file': file,
     } if target.meta['type'] == 'video' else {
         'thumb_dl_id': target.id,
+        'thumb_file': file,
     }
 
 
@@ -189,18 +260,21 @@ def update_download_fields(
         targets: List[downloader.Downloadable],
         get_fields: Callable[[downloader.Downloadable], dict]
 ):
-    try:
-        # don't bother the database if there's no video-related targets
-        if not utils.find(targets, lambda target: 'video_id' in target.meta):
-            return
+    # don't bother the database if there's no video-related targets
+    if not utils.find(targets, lambda target: 'video_id' in target.meta):
+        return
+
+    def update(db: Session):
+        for target in targets:
+            if 'video_id' in target.meta:
+                fields = get_fields(target)
 
-        with get_db_ctx() as db:
-            for target in targets:
-                if 'video_id' in target.meta:
-                    fields = get_fields(target)
+                crud.update_video(db, target.meta['video_id'], fields)
 
-                    crud.update_video(db, target.meta['video_id'], fields)
+    def on_done(future: Future):
+        if future.exception():
+            logger.warn('Could not update download fields by targets', targets)
+            logger.error(repr(future.exception()))
 
-    except Exception as e:
-        logger.warn('Could not update download fields by targets', targets)
-        logger.exception(e)
+    # no need to wait, the writer will commit it along with other writes
+    writer.submit(update).add_done_callback(on_done)
@@ -0,0 +1,126 @@
+from typing import List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from christina.db import get_async_read_db, write, RecordNotFound
+from christina.logger import get_logger
+from christina.video import crud, crud_async, schemas
+from christina.video.cache import catalog
+from christina.video.serialize import serialize_video_list
+from .video import get_video_filter, get_batch_ids, get_fields
+from ..utils import etag_matches, not_modified, set_etag
+
+logger = get_logger(__name__)
+
+# the hot routes of videos, served on the event loop instead of the threadpool when DB_ASYNC is enabled;
+# the rest of the routes fall through to the sync router
+router = APIRouter(prefix='/videos')
+
+
+@router.get('', response_model=schemas.VideoList)
+async def route_videos(
+        request: Request,
+        filter: schemas.VideoFilter = Depends(get_video_filter),
+        offset: int = 0,
+        limit: int = 100,
+        order: str = '',
+        cursor: Optional[str] = None,
+        ids: List[int] = Depends(get_batch_ids),
+        field_names: Optional[Set[str]] = Depends(get_fields),
+        db: AsyncSession = Depends(get_async_read_db)
+):
+    # versions are checked before touching the database
+    etag = catalog.get_list_etag()
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if ids:
+        # batch mode, the filter and the page are ignored
+        videos = await crud_async.get_videos_by_ids(db, ids, field_names)
+        total, next_cursor = len(videos), None
+    else:
+        try:
+            videos, total, next_cursor = await crud_async.get_videos(
+                db,
+                filter,
+                offset=offset,
+                limit=limit,
+                order=order,
+                cursor=cursor,
+                fields=field_names
+            )
+        except ValueError as e:
+            # an invalid order or cursor
+            raise HTTPException(400, str(e))
+
+    # skip the validation of pydantic, which dominates the time of large lists
+    response = Response(
+        serialize_video_list(videos, total, next_cursor, field_names),
+        media_type='application/json'
+    )
+    set_etag(response, etag)
+
+    return response
+
+
+@router.get('/facets', response_model=schemas.VideoFacets)
+async def route_video_facets(
+        request: Request,
+        response: Response,
+        filter: schemas.VideoFilter = Depends(get_video_filter),
+        db: AsyncSession = Depends(get_async_read_db)
+):
+    etag = catalog.get_list_etag()
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+
+    return await crud_async.get_facets(db, filter)
+
+
+@router.get('/random', response_model=schemas.Video)
+async def route_random_video(
+        exclude: Optional[int],
+        rating: Optional[int] = None,
+        db: AsyncSession = Depends(get_async_read_db)
+):
+    return await crud_async.get_random_video(db, exclude, rating)
+
+
+@router.get('/shuffle/{session}', response_model=schemas.Video)
+async def route_shuffled_video(session: str, db: AsyncSession = Depends(get_async_read_db)):
+    try:
+        return await crud_async.get_shuffled_video(db, session)
+    except RecordNotFound:
+        raise HTTPException(404, 'Shuffle session has expired.')
+
+
+@router.get('/{id}', response_model=schemas.Video)
+async def route_video(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    etag = catalog.get_video_etag(id)
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+
+    return await crud_async.get_video(db, id)
+
+
+@router.patch('/{id}', response_model=schemas.Video)
+async def route_update_video(id: int, update: schemas.VideoUpdate, db: AsyncSession = Depends(get_async_read_db)):
+    fields = update.dict(exclude_unset=True)
+
+    # all the writes go through the single writer
+    await write(lambda write_db: crud.update_video(write_db, id, fields))
+
+    return await crud_async.get_video(db, id)
+
+
+@router.delete('/{id}')
+async def route_delete_video(id: int):
+    await write(lambda write_db: crud.delete_video(write_db, id))
@@ -6,10 +6,27 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # noinspection PyUnresolvedReferences
 import christina.env
+from christina.db import DB_ASYNC
+from christina.db.migrations import migrate
+from christina.env import DEV_MODE
+from christina.net import downloader
+from christina.video import crud
 from .routes import video, download, people, character, tag, proxy
 
+# all the models have been imported by now
+migrate()
+
+if DEV_MODE:
+    crud.check_query_plans()
+
 app = FastAPI()
 
+if DB_ASYNC:
+    from .routes import video_async
+
+    # registered first to take over the routes it defines
+    app.include_router(video_async.router)
+
 app.include_router(video.router)
 app.include_router(download.router)
 app.include_router(people.router)
@@ -18,6 +35,12 @@ app.include_router(tag.router)
 app.include_router(proxy.router)
 
 
+@app.on_event('startup')
+def on_startup():
+    # the routes have subscribed to the downloader's events by now
+    downloader.restore()
+
+
 @app.exception_handler(Exception)
 async def general_handler(request, exc):
     if not isinstance(exc, HTTPException):
@@ -1,7 +1,9 @@
 import asyncio
-from typing import List, Union
+import json
+from collections import deque
+from typing import List, Union, Dict, Callable, Optional, Deque
 
-from fastapi import WebSocket
+from fastapi import Request, Response, WebSocket
 from starlette.websockets import WebSocketState
 from websockets.exceptions import ConnectionClosed
 
@@ -9,47 +11,224 @@ from christina.logger import get_logger
 
 logger = get_logger(__name__)
 
+# merges a pending message into a newer one of the same type, so a slow client receives only one of them
+Coalescer = Callable[[dict, dict], dict]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+
+    if not if_none_match:
+        return False
+
+    # weak comparison, as in the spec
+    tags = [tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')]
+
+    return '*' in tags or etag.replace('W/', '', 1) in tags
+
+
+def set_etag(response: Response, etag: str):
+    response.headers['ETag'] = etag
+
+    # the client may keep the response, but must revalidate it every time
+    response.headers['Cache-Control'] = 'no-cache'
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+
+def json_response(request: Request, body: bytes, etag: str) -> Response:
+    """
+    Sends the pre-serialized JSON, or 304 if the client already has it.
+    """
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = Response(body, media_type='application/json')
+    set_etag(response, etag)
+    return response
+
+
+def serialize(message: Union[str, dict]) -> str:
+    if isinstance(message, str):
+        # convert it to JSON format so the client can parse it correctly
+        return f'"{message}"'
+
+    return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+
+class QueuedMessage:
+    def __init__(self, message: Union[str, dict], text: Optional[str]):
+        self.message = message
+
+        # shared by all the connections, unless the message has been coalesced for a particular one
+        self.text = text
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.message.get('type') if isinstance(self.message, dict) else None
+
+
+class Client:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: Deque[QueuedMessage] = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.coalesced = 0
+
 
 class ConnectionManager:
     """
     https://fastapi.tiangolo.com/advanced/websockets/#handling-disconnections-and-multiple-clients
+
+    Each connection has its own queue and sender task, so a slow client never delays the others.
+    A client whose queue overflows or whose send stalls is evicted.
     """
 
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue: int = 50, send_timeout: float = 10):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+
+        self.clients: Dict[WebSocket, Client] = {}
+        self.coalescers: Dict[str, Coalescer] = {}
+
+        self.evicted = 0
 
         self.loop = asyncio.get_event_loop()
 
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    def coalesce(self, type: str, coalescer: Coalescer):
+        """
+        Allows pending messages of given type to be merged with newer ones.
+        """
+        self.coalescers[type] = coalescer
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+
+        client = Client(websocket)
+        client.task = asyncio.ensure_future(self.run_sender(client))
+
+        self.clients[websocket] = client
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def send(self, websocket: WebSocket, message: Union[str, dict]):
+        """
+        Queues a message for a single connection.
+        """
+        client = self.clients.get(websocket)
+
+        if client:
+            self.enqueue(client, QueuedMessage(message, None))
 
     def broadcast(self, message: Union[str, dict]):
-        self.loop.call_soon_threadsafe(lambda: self.loop.create_task(self.broadcast_async(message)))
+        self.loop.call_soon_threadsafe(self.broadcast_now, message)
 
     async def broadcast_async(self, message: Union[str, dict]):
-        try:
-            if isinstance(message, str):
-                send_method = 'send_text'
+        self.broadcast_now(message)
 
-                # convert it to JSON format so the client can parse it correctly
-                message = f'"{message}"'
-            else:
-                send_method = 'send_json'
+    def broadcast_now(self, message: Union[str, dict]):
+        try:
+            if not self.clients:
+                return
 
-            for connection in self.active_connections:
-                try:
-                    if connection.application_state != WebSocketState.CONNECTED:
-                        raise ConnectionClosed
+            # serialize only once for all the connections
+            text = serialize(message)
 
-                    await getattr(connection, send_method)(message)
-                except ConnectionClosed:
-                    self.disconnect(connection)
+            for client in list(self.clients.values()):
+                self.enqueue(client, QueuedMessage(message, text))
 
         except Exception as e:
             logger.error('Could not broadcast message.')
             logger.exception(e)
+
+    def enqueue(self, client: Client, queued: QueuedMessage):
+        coalescer = self.coalescers.get(queued.type)
+
+        if coalescer:
+            # the message being sent has been popped, so any pending one of the same type can be merged
+            for i, pending in enumerate(client.queue):
+                if pending.type == queued.type:
+                    del client.queue[i]
+
+                    queued = QueuedMessage(coalescer(pending.message, queued.message), None)
+                    client.coalesced += 1
+                    break
+
+        client.queue.append(queued)
+        client.ready.set()
+
+        if len(client.queue) > self.max_queue:
+            self.evict(client, f'{len(client.queue)} messages pending')
+
+    async def run_sender(self, client: Client):
+        try:
+            while True:
+                await client.ready.wait()
+
+                while client.queue:
+                    queued = client.queue.popleft()
+
+                    if client.websocket.application_state != WebSocketState.CONNECTED:
+                        raise ConnectionClosed(None, None)
+
+                    text = queued.text if queued.text is not None else serialize(queued.message)
+
+                    await asyncio.wait_for(client.websocket.send_text(text), self.send_timeout)
+
+                    client.sent += 1
+
+                client.ready.clear()
+
+        except asyncio.TimeoutError:
+            self.evict(client, 'send timed out')
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception:
+            # mostly ConnectionClosed
+            self.disconnect(client.websocket)
+
+    def evict(self, client: Client, reason: str):
+        logger.warn(f'Evicting a slow client ({reason}):', client.websocket.client)
+
+        self.evicted += 1
+        self.disconnect(client.websocket)
+
+        client.queue.clear()
+
+        async def close():
+            try:
+                # 1008: policy violation
+                await client.websocket.close(code=1008)
+            except Exception:
+                pass
+
+        asyncio.ensure_future(close())
+
+    def get_stats(self) -> dict:
+        depths = [len(client.queue) for client in self.clients.values()]
+
+        return {
+            'connections': len(self.clients),
+            'queue_depths': depths,
+            'max_queue_depth': max(depths, default=0),
+            'sent': sum(client.sent for client in self.clients.values()),
+            'coalesced': sum(client.coalesced for client in self.clients.values()),
+            'evicted': self.evicted,
+        }
@@ -0,0 +1,260 @@
+from itertools import chain
+from threading import RLock, Thread
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from christina.db import get_read_db_ctx
+from christina.logger import get_logger
+from . import models, schemas
+
+logger = get_logger(__name__)
+
+# a change to apply once committed, e.g. ('tag', video_id, tag_id, True)
+Op = Tuple
+
+
+def count_bits(bitmap: int) -> int:
+    return bin(bitmap).count('1')
+
+
+def to_ids(bitmap: int, after: int = 0, skip: int = 0, limit: Optional[int] = None) -> List[int]:
+    """
+    Returns the set bits greater than `after` in ascending order, which are the IDs of videos.
+    """
+    # find() on the reversed binary string is much faster than checking the bits one by one
+    bits = bin(bitmap >> (after + 1))[:1:-1]
+    end = None if limit is None else skip + limit
+
+    ids = []
+    i = bits.find('1')
+
+    while i != -1 and (end is None or len(ids) < end):
+        ids.append(i + after + 1)
+        i = bits.find('1', i + 1)
+
+    return ids[skip:]
+
+
+class BitmapIndex:
+    """
+    Maps each tag, char, creator and rating to a bitmap of the videos that have it, with the video IDs
+    as the bit positions. Combined filters are answered by the bitwise operations on Python's ints.
+
+    Built in the background on the first use, the changes committed meanwhile are replayed afterwards.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.building = False
+
+        # all the videos that are not deleted
+        self.alive = 0
+
+        self.tags: Dict[int, int] = {}
+        self.chars: Dict[int, int] = {}
+        self.creators: Dict[int, int] = {}
+        self.ratings: Dict[int, int] = {}
+
+        # the attributes of each video, to clear its old bits when they change
+        self.videos: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
+
+        self.backlog: List[Op] = []
+
+        self.lock = RLock()
+
+    def ensure_built(self) -> bool:
+        """
+        Starts building if not yet, returns whether the index can be used.
+        """
+        with self.lock:
+            if not self.ready and not self.building:
+                self.building = True
+                Thread(name='BitmapIndex', target=self.build, daemon=True).start()
+
+            return self.ready
+
+    def build(self):
+        try:
+            with get_read_db_ctx() as db:
+                videos = db.execute(
+                    select(models.Video.id, models.Video.creator_id, models.Video.rating)
+                    .filter(models.Video.deleted == None)
+                ).all()
+
+                chars = db.execute(select(models.video_char_table.c.video_id, models.video_char_table.c.char_id)).all()
+                tags = db.execute(select(models.video_tag_table.c.video_id, models.video_tag_table.c.tag_id)).all()
+
+            with self.lock:
+                for id, creator_id, rating in videos:
+                    self.set_video(id, True, creator_id, rating)
+
+                for video_id, char_id in chars:
+                    self.set_member(self.chars, video_id, char_id, True)
+
+                for video_id, tag_id in tags:
+                    self.set_member(self.tags, video_id, tag_id, True)
+
+                # every op is idempotent, so it doesn't matter if some of them were already in the snapshot
+                for op in self.backlog:
+                    self.apply(op)
+
+                self.backlog = []
+                self.ready = True
+
+            logger.info(f'Bitmap index built with {len(videos)} videos')
+
+        except Exception as e:
+            logger.warn('Could not build bitmap index, falling back to SQL.')
+            logger.exception(e)
+
+            with self.lock:
+                self.backlog = []
+
+        finally:
+            self.building = False
+
+    def submit(self, ops: List[Op]):
+        with self.lock:
+            if self.ready:
+                for op in ops:
+                    self.apply(op)
+
+            elif self.building:
+                self.backlog += ops
+
+    def apply(self, op: Op):
+        kind = op[0]
+
+        if kind == 'video':
+            self.set_video(*op[1:])
+        elif kind == 'char':
+            self.set_member(self.chars, *op[1:])
+        elif kind == 'tag':
+            self.set_member(self.tags, *op[1:])
+
+    def set_video(self, id: int, alive: bool, creator_id: Optional[int], rating: Optional[int]):
+        bit = 1 << id
+
+        old = self.videos.pop(id, None)
+
+        if old:
+            self.set_member(self.creators, id, old[0], False)
+            self.set_member(self.ratings, id, old[1], False)
+
+        if alive:
+            self.alive |= bit
+            self.videos[id] = (creator_id, rating)
+
+            self.set_member(self.creators, id, creator_id, True)
+            self.set_member(self.ratings, id, rating, True)
+        else:
+            self.alive &= ~bit
+
+    @staticmethod
+    def set_member(bitmaps: Dict[int, int], video_id: int, key: Optional[int], present: bool):
+        if key is None:
+            return
+
+        if present:
+            bitmaps[key] = bitmaps.get(key, 0) | (1 << video_id)
+        elif key in bitmaps:
+            bitmaps[key] &= ~(1 << video_id)
+
+            if not bitmaps[key]:
+                del bitmaps[key]
+
+    def query(self, filter: schemas.VideoFilter) -> int:
+        """
+        Returns the bitmap of the videos matching the filter, except the search.
+        """
+        with self.lock:
+            bitmap = self.alive
+
+            if filter.creator_id:
+                bitmap &= self.creators.get(filter.creator_id, 0)
+
+            if filter.rating:
+                union = 0
+
+                for rating in filter.rating:
+                    union |= self.ratings.get(rating, 0)
+
+                bitmap &= union
+
+            for bitmaps, any_of, all_of, none_of in (
+                    (self.chars, filter.char, filter.char_all, filter.char_none),
+                    (self.tags, filter.tag, filter.tag_all, filter.tag_none),
+            ):
+                if any_of:
+                    union = 0
+
+                    for key in any_of:
+                        union |= bitmaps.get(key, 0)
+
+                    bitmap &= union
+
+                for key in all_of:
+                    bitmap &= bitmaps.get(key, 0)
+
+                for key in none_of:
+                    bitmap &= ~bitmaps.get(key, 0)
+
+            return bitmap
+
+    def get_facets(self, bitmap: int) -> dict:
+        """
+        Counts the videos in the bitmap for every tag, char, creator and rating.
+        """
+        with self.lock:
+            facets = {}
+
+            for name, bitmaps in (
+                    ('tags', self.tags), ('chars', self.chars), ('creators', self.creators), ('ratings', self.ratings)
+            ):
+                counts = {}
+
+                for key, members in bitmaps.items():
+                    count = count_bits(bitmap & members)
+
+                    if count:
+                        counts[key] = count
+
+                facets[name] = counts
+
+            return facets
+
+
+bitmap_index = BitmapIndex()
+
+
+def record(db: Session, *op):
+    """
+    Records a change that doesn't go through the ORM, to be applied to the index once committed.
+    """
+    db.info.setdefault('bitmap_ops', []).append(op)
+
+
+@event.listens_for(Session, 'after_flush')
+def on_flush(db: Session, flush_context):
+    for obj in chain(db.new, db.dirty):
+        if isinstance(obj, models.Video):
+            record(db, 'video', obj.id, obj.deleted is None, obj.creator_id, obj.rating)
+
+    for obj in db.deleted:
+        if isinstance(obj, models.Video):
+            record(db, 'video', obj.id, False, None, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def on_commit(db: Session):
+    ops = db.info.pop('bitmap_ops', None)
+
+    if ops:
+        bitmap_index.submit(ops)
+
+
+@event.listens_for(Session, 'after_rollback')
+def on_rollback(db: Session):
+    db.info.pop('bitmap_ops', None)
@@ -0,0 +1,175 @@
+import hashlib
+import secrets
+from collections import OrderedDict
+from itertools import chain
+from threading import Lock
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+
+# distinguishes the versions from the ones before a restart
+BOOT_ID = secrets.token_hex(4)
+
+# the models whose changes make the cached results stale
+CATALOG_MODELS = (models.Video, models.Person, models.Character, models.Tag)
+
+
+class Catalog:
+    """
+    Tracks the version of the video catalog, which is bumped by every committed change to it,
+    and the version of each table in it.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.versions: Dict[str, int] = {}
+
+        # versions of the videos whose own rows or relations have changed
+        self.video_versions: Dict[int, int] = {}
+
+        self.lock = Lock()
+
+    def bump(self, tables: Iterable[str], video_ids: Iterable[int] = ()):
+        with self.lock:
+            self.version += 1
+
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+            for id in video_ids:
+                self.video_versions[id] = self.version
+
+    def get_version(self, table: str) -> int:
+        return self.versions.get(table, 0)
+
+    def get_list_etag(self) -> str:
+        return f'W/"{BOOT_ID}-{self.version}"'
+
+    def get_video_etag(self, id: int) -> str:
+        # renaming a tag, char or person may change any video
+        shared = sum(self.get_version(table) for table in ('people', 'chars', 'tags'))
+
+        return f'W/"{BOOT_ID}-{shared}-{self.video_versions.get(id, 0)}"'
+
+
+catalog = Catalog()
+
+
+def mark_changed(db: Session, *tables: str, video_id: Optional[int] = None):
+    """
+    Marks the tables as changed by a statement that doesn't go through the ORM, e.g. on the join tables.
+    """
+    db.info.setdefault('catalog_changes', set()).update(tables)
+
+    if video_id is not None:
+        db.info.setdefault('changed_videos', set()).add(video_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def on_flush(db: Session, flush_context):
+    for obj in chain(db.new, db.dirty, db.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            mark_changed(db, obj.__tablename__, video_id=obj.id if isinstance(obj, models.Video) else None)
+
+
+@event.listens_for(Session, 'after_commit')
+def on_commit(db: Session):
+    tables = db.info.pop('catalog_changes', None)
+    video_ids = db.info.pop('changed_videos', ())
+
+    if tables:
+        catalog.bump(tables, video_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def on_rollback(db: Session):
+    db.info.pop('catalog_changes', None)
+    db.info.pop('changed_videos', None)
+
+
+class VersionedCache:
+    """
+    An LRU cache that is emptied whenever the catalog changes.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.items: OrderedDict = OrderedDict()
+        self.version = catalog.version
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def sync(self):
+        if self.version != catalog.version:
+            self.items.clear()
+            self.version = catalog.version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            self.sync()
+
+            value = self.items.get(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.items.move_to_end(key)
+
+            return value
+
+    def set(self, key: Hashable, value: Any, version: int):
+        """
+        Stores a value computed at given version, so it's discarded if the catalog has changed meanwhile.
+        """
+        with self.lock:
+            self.sync()
+
+            if version != self.version:
+                return
+
+            self.items[key] = value
+            self.items.move_to_end(key)
+
+            if len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+
+# total numbers of videos by their filters
+totals = VersionedCache()
+
+
+class SerializedCatalogs:
+    """
+    Keeps the serialized lists of whole tables along with their ETags, until the tables change.
+    """
+
+    def __init__(self):
+        self.items: Dict[str, Tuple[int, bytes, str]] = {}
+        self.lock = Lock()
+
+    def get(self, table: str) -> Optional[Tuple[bytes, str]]:
+        with self.lock:
+            item = self.items.get(table)
+
+            if item and item[0] == catalog.get_version(table):
+                return item[1], item[2]
+
+            return None
+
+    def set(self, table: str, version: int, body: bytes) -> Tuple[bytes, str]:
+        # hashing the content keeps the ETags valid across restarts, unlike the versions
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+        with self.lock:
+            self.items[table] = (version, body, etag)
+
+        return body, etag
+
+
+serialized_catalogs = SerializedCatalogs()
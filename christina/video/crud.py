@@ -1,92 +1,451 @@
+import base64
+import json
 from datetime import datetime
-from typing import Union, Tuple, List, Optional
+from typing import Union, Tuple, List, Optional, Any, Set
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, select, update, and_, or_, DateTime, union_all, literal
+from sqlalchemy.orm import Session, selectinload, InstrumentedAttribute, load_only
+from sqlalchemy.sql import Select
 
 from christina.db import RecordNotFound, RecordExists
+from christina.db.migrations import find_full_scans
 from christina.logger import get_logger
 from . import models, schemas
+from .cache import mark_changed, totals, catalog, serialized_catalogs
+from .bitmap import bitmap_index, count_bits, to_ids, record
+from .shuffle import random_index, shuffler, mark_candidates_changed, CANDIDATE_COLUMNS
 
 logger = get_logger(__name__)
 
+# relationships that are always serialized along with videos
+video_load_options = (
+    selectinload(models.Video.creator),
+    selectinload(models.Video.chars),
+    selectinload(models.Video.tags),
+)
+
+LOADED_RELATIONSHIPS = ('creator', 'chars', 'tags')
+
+# the columns of the serialized fields that don't have their own
+FIELD_COLUMNS = {
+    'url': 'file',
+    'thumb': 'thumb_file',
+}
+
+MAX_BATCH_SIZE = schemas.MAX_BATCH_SIZE
+
+# the search index is made of trigrams, shorter words aren't in it
+MIN_INDEXED_LENGTH = 3
+
 
 def get_video(db: Session, id: int):
     return db.query(models.Video).get(id)
 
 
 def get_random_video(db: Session, exclude: Optional[int], rating: Optional[int]):
-    query = db.query(models.Video).filter_by(deleted=None, video_dl_id=None, thumb_dl_id=None)
+    refresh_random_index(db)
+
+    id = random_index.pick(exclude, rating)
 
-    if exclude is not None:
-        query = query.filter(models.Video.id != exclude)
+    return get_video(db, id) if id is not None else None
 
-    if rating is not None:
-        query = query.filter_by(rating=rating)
 
-    return query.order_by(func.random()).first()
+def create_shuffle(db: Session, rating: Optional[int]) -> dict:
+    refresh_random_index(db)
+
+    return {
+        'session': shuffler.create(rating),
+        'total': len(random_index.get_pool(rating)),
+    }
+
+
+def get_shuffled_video(db: Session, session: str):
+    refresh_random_index(db)
+
+    found, id = shuffler.next(session, random_index)
+
+    if not found:
+        raise RecordNotFound
+
+    return get_video(db, id) if id is not None else None
+
+
+def refresh_random_index(db: Session):
+    if random_index.stale:
+        version = random_index.changes
+        random_index.load(db.execute(select_random_candidates()).all(), version)
+
+
+def select_random_candidates() -> Select:
+    # served by the partial index of playable videos
+    return select(models.Video.id, models.Video.rating) \
+        .filter_by(deleted=None, video_dl_id=None, thumb_dl_id=None) \
+        .order_by(models.Video.id)
 
 
 def get_videos(
         db: Session,
+        filter: schemas.VideoFilter,
         *,
-        search: Optional[str],
-        creator_id: Optional[int],
-        char: Optional[Union[int, List[int]]],
-        tag: Optional[Union[int, List[int]]],
         offset: int,
         limit: int,
-        order: str
-) -> Tuple[models.Video, int]:
-    query = db.query(models.Video) \
-        .filter(models.Video.deleted == None) \
-        .options(selectinload(models.Video.creator), selectinload(models.Video.chars), selectinload(models.Video.tags))
-
-    if search:
-        query = query.filter(models.Video.title.like(f'%{search}%'))
-
-    if creator_id:
-        query = query.filter(models.Video.creator_id == creator_id)
-
-    if char:
-        if isinstance(char, int):
-            query = query.filter(
-                models.Video.chars.any(models.Character.id == char)
-            )
+        order: str,
+        cursor: Optional[str] = None,
+        fields: Optional[Set[str]] = None
+) -> Tuple[List[models.Video], int, Optional[str]]:
+    if not is_searching(filter.search) and bitmap_index.ensure_built():
+        stmt, total = page_videos_by_bitmap(filter, order=order, offset=offset, limit=limit, cursor=cursor)
+    else:
+        stmt = select_videos(filter)
+
+        key = get_total_key(filter)
+        total = totals.get(key)
+
+        if total is None:
+            version = catalog.version
+            total = db.execute(count_of(stmt)).scalar()
+            totals.set(key, total, version)
+
+        stmt = page_videos(stmt, search=filter.search, order=order, offset=offset, limit=limit, cursor=cursor)
+
+    db_videos = db.execute(stmt.options(*get_load_options(fields, order))).scalars().all()
+
+    return db_videos, total, get_next_cursor(db_videos, search=filter.search, order=order, limit=limit)
+
+
+def get_videos_by_ids(db: Session, ids: List[int], fields: Optional[Set[str]] = None) -> List[models.Video]:
+    """
+    Returns the existing ones of given videos in the same order, including the deleted ones.
+    """
+    return sort_by_ids(db.execute(select_videos_by_ids(ids, fields)).scalars().all(), ids)
+
+
+def select_videos_by_ids(ids: List[int], fields: Optional[Set[str]]) -> Select:
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'Too many IDs, at most {MAX_BATCH_SIZE} are allowed.')
+
+    return select(models.Video).filter(models.Video.id.in_(ids)).options(*get_load_options(fields))
+
+
+def sort_by_ids(videos: List[models.Video], ids: List[int]) -> List[models.Video]:
+    videos_by_id = {video.id: video for video in videos}
+
+    return [videos_by_id[id] for id in dict.fromkeys(ids) if id in videos_by_id]
+
+
+def get_load_options(fields: Optional[Set[str]], order: str = '') -> list:
+    """
+    Loads only the columns and relationships needed by the fields, and by the order for the cursor.
+    """
+    if fields is None:
+        return list(video_load_options)
+
+    columns = {FIELD_COLUMNS.get(name, name) for name in fields if name not in LOADED_RELATIONSHIPS}
+
+    if 'creator' in fields:
+        columns.add('creator_id')
+
+    field, _ = parse_order(order)
+
+    if field is not None:
+        columns.add(field.key)
+
+    return [
+        load_only(*(getattr(models.Video, column) for column in columns)),
+        *(selectinload(getattr(models.Video, name)) for name in LOADED_RELATIONSHIPS if name in fields),
+    ]
+
+
+def select_videos(filter: schemas.VideoFilter, *columns) -> Select:
+    """
+    Builds the filtered statement shared by the sync and async paths, selecting given columns or the videos.
+    """
+    stmt = select(*(columns or [models.Video])).filter(models.Video.deleted == None)
+
+    if is_searching(filter.search):
+        fts = models.videos_fts_table.c
+
+        # ordered by relevance unless another order is given
+        stmt = stmt.join(models.videos_fts_table, fts.rowid == models.Video.id) \
+            .filter(*match_videos(filter.search)) \
+            .order_by(fts.rank)
+
+    if filter.creator_id:
+        stmt = stmt.filter(models.Video.creator_id == filter.creator_id)
+
+    if filter.rating:
+        stmt = stmt.filter(models.Video.rating.in_(filter.rating))
+
+    # look up the join tables by their reverse indexes, rather than checking every video with EXISTS
+    for table, key, any_of, all_of, none_of in (
+            (models.video_char_table, 'char_id', filter.char, filter.char_all, filter.char_none),
+            (models.video_tag_table, 'tag_id', filter.tag, filter.tag_all, filter.tag_none),
+    ):
+        def having(ids: List[int]):
+            return select(table.c.video_id).where(table.c[key].in_(ids))
+
+        if any_of:
+            stmt = stmt.filter(models.Video.id.in_(having(any_of)))
+
+        for id in all_of:
+            stmt = stmt.filter(models.Video.id.in_(having([id])))
+
+        if none_of:
+            stmt = stmt.filter(models.Video.id.notin_(having(none_of)))
+
+    return stmt
+
+
+def page_videos_by_bitmap(
+        filter: schemas.VideoFilter,
+        *,
+        order: str,
+        offset: int,
+        limit: int,
+        cursor: Optional[str]
+) -> Tuple[Select, int]:
+    """
+    Filters the videos with the bitmap index, returns the statement of the page and the total.
+    """
+    bitmap = bitmap_index.query(filter)
+    total = count_bits(bitmap)
+
+    field, _ = parse_order(order)
+
+    if field is None:
+        # the IDs are already in order, only the page needs to be fetched
+        if cursor:
+            ids = to_ids(bitmap, after=decode_cursor(cursor, None)[1], limit=limit)
         else:
-            query = query.filter(
-                models.Video.chars.any(models.Character.id.in_(char))
-            )
+            ids = to_ids(bitmap, skip=offset, limit=limit)
+
+        stmt = select(models.Video).filter(models.Video.id.in_(ids)).order_by(models.Video.id)
+
+        return stmt, total
+
+    # let SQLite sort the matched IDs, passed as a single JSON parameter
+    matched = func.json_each(json.dumps(to_ids(bitmap))).table_valued('value')
+    stmt = select(models.Video).filter(models.Video.id.in_(select(matched.c.value)))
+
+    return page_videos(stmt, search=None, order=order, offset=offset, limit=limit, cursor=cursor), total
+
+
+def get_facets(db: Session, filter: schemas.VideoFilter) -> dict:
+    if not is_searching(filter.search) and bitmap_index.ensure_built():
+        bitmap = bitmap_index.query(filter)
+
+        return {'total': count_bits(bitmap), **bitmap_index.get_facets(bitmap)}
+
+    return to_facets(db.execute(select_facets(filter)).all())
+
+
+def select_facets(filter: schemas.VideoFilter) -> Select:
+    """
+    Counts the matched videos by tag, char, creator and rating in a single statement.
+    """
+    matched = select_videos(filter, models.Video.id, models.Video.creator_id, models.Video.rating) \
+        .order_by(None) \
+        .cte('matched')
+
+    matched_ids = select(matched.c.id)
+
+    tags = models.video_tag_table.c
+    chars = models.video_char_table.c
+
+    return union_all(
+        select(literal('tags'), tags.tag_id, func.count())
+        .where(tags.video_id.in_(matched_ids))
+        .group_by(tags.tag_id),
+
+        select(literal('chars'), chars.char_id, func.count())
+        .where(chars.video_id.in_(matched_ids))
+        .group_by(chars.char_id),
+
+        select(literal('creators'), matched.c.creator_id, func.count())
+        .where(matched.c.creator_id != None)
+        .group_by(matched.c.creator_id),
+
+        select(literal('ratings'), matched.c.rating, func.count())
+        .group_by(matched.c.rating),
+    )
+
+
+def to_facets(rows: List[Tuple[str, int, int]]) -> dict:
+    facets = {'tags': {}, 'chars': {}, 'creators': {}, 'ratings': {}}
+
+    for name, key, count in rows:
+        facets[name][key] = count
+
+    # every video has a rating
+    return {'total': sum(facets['ratings'].values()), **facets}
+
+
+def to_fts_query(words: List[str]) -> str:
+    """
+    Converts the words to an FTS5 query, where every word must be found in any part of the texts.
+    """
+    # quoting the words prevents them from being parsed as operators
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def match_videos(search: str) -> list:
+    """
+    Returns the clauses matching the search index against every word of the user input.
+    """
+    fts = models.videos_fts_table.c
+
+    words = search.split()
+    indexed = [word for word in words if len(word) >= MIN_INDEXED_LENGTH]
+
+    clauses = [fts.videos_fts.op('MATCH')(to_fts_query(indexed))] if indexed else []
+
+    # the trigrams can't find shorter words, e.g. "ミク", so those are looked for in every row like LIKE used to
+    for word in words:
+        if len(word) < MIN_INDEXED_LENGTH:
+            clauses.append(or_(*(
+                func.instr(func.lower(column), word.lower()) > 0
+                for column in (fts.title, fts.creator, fts.tags, fts.chars)
+            )))
+
+    return clauses
+
+
+def is_searching(search: Optional[str]) -> bool:
+    return bool(search and search.strip())
+
+
+def parse_order(order: str) -> Tuple[Optional[InstrumentedAttribute], bool]:
+    """
+    Returns the field to order by, and whether it's in descending order.
+    """
+    if not order:
+        return None, False
+
+    descend = True
+
+    if '-' in order:
+        descend = False
+        order = order.replace('-', '')
 
-    if tag:
-        if isinstance(tag, int):
-            query = query.filter(models.Video.tags.any(models.Tag.id == tag))
+    # only the columns, the relationships and other class attributes can't be ordered by
+    if order not in models.Video.__table__.c:
+        raise ValueError('Invalid order.')
+
+    return getattr(models.Video, order), descend
+
+
+def order_videos(stmt: Select, order: str) -> Select:
+    field, descend = parse_order(order)
+
+    if field is None:
+        # the ID comes after the relevance when searching, either way the pages must be stable
+        return stmt.order_by(models.Video.id)
+
+    return stmt.order_by(None).order_by(field.desc() if descend else field, models.Video.id)
+
+
+def can_seek(search: Optional[str], order: str) -> bool:
+    # the relevance is computed by the query, so there's no value to seek from
+    return bool(order) or not is_searching(search)
+
+
+def seek_videos(stmt: Select, order: str, cursor: str) -> Select:
+    """
+    Continues from the video encoded in the cursor, which unlike the offset doesn't slow down on deep pages.
+    """
+    field, descend = parse_order(order)
+    value, last_id = decode_cursor(cursor, field)
+
+    after_last = models.Video.id > last_id
+
+    if field is None:
+        return stmt.filter(after_last)
+
+    # NULLs come first in ascending order, and last in descending order
+    if value is None:
+        cond = and_(field == None, after_last)
+
+        if not descend:
+            cond = or_(cond, field != None)
+    elif descend:
+        cond = or_(field < value, and_(field == value, after_last))
+
+        # the redundant bound lets SQLite seek in the index, but would exclude the NULLs
+        if field.expression.nullable:
+            cond = or_(cond, field == None)
         else:
-            query = query.filter(models.Video.tags.any(models.Tag.id.in_(tag)))
+            cond = and_(field <= value, cond)
+    else:
+        cond = and_(field >= value, or_(field > value, and_(field == value, after_last)))
+
+    return stmt.filter(cond)
+
+
+def page_videos(
+        stmt: Select,
+        *,
+        search: Optional[str],
+        order: str,
+        offset: int,
+        limit: int,
+        cursor: Optional[str]
+) -> Select:
+    stmt = order_videos(stmt, order)
+
+    if cursor:
+        if not can_seek(search, order):
+            raise ValueError('Cursor is not supported when ordering by relevance.')
+
+        stmt = seek_videos(stmt, order, cursor)
+    else:
+        stmt = stmt.offset(offset)
 
-    # count without setting the order
-    total = query.count()
+    return stmt.limit(limit)
 
-    if order:
-        descend = True
 
-        if '-' in order:
-            descend = False
-            order = order.replace('-', '')
+def encode_cursor(video: models.Video, order: str) -> str:
+    field, _ = parse_order(order)
+    value = getattr(video, field.key) if field is not None else None
 
-        if order not in models.Video.__dict__:
-            raise ValueError('Invalid order.')
+    if isinstance(value, datetime):
+        value = value.isoformat()
 
-        order_field = getattr(models.Video, order)
+    return base64.urlsafe_b64encode(json.dumps([value, video.id]).encode()).decode()
 
-        if descend:
-            order_field = order_field.desc()
 
-        query = query.order_by(order_field, models.Video.id)
+def decode_cursor(cursor: str, field: Optional[InstrumentedAttribute]) -> Tuple[Any, int]:
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor))
 
-    db_videos = query.offset(offset).limit(limit).all()
+        if value is not None and field is not None and isinstance(field.type, DateTime):
+            value = datetime.fromisoformat(value)
 
-    return db_videos, total
+        return value, int(id)
+
+    except Exception:
+        raise ValueError('Invalid cursor.')
+
+
+def get_next_cursor(videos: List[models.Video], *, search: Optional[str], order: str, limit: int) -> Optional[str]:
+    if len(videos) < limit or not videos or not can_seek(search, order):
+        return None
+
+    return encode_cursor(videos[-1], order)
+
+
+def get_total_key(filter: schemas.VideoFilter) -> tuple:
+    # the same filters in any form share the cached total
+    return (
+        filter.search.strip() if is_searching(filter.search) else None,
+        filter.creator_id or None,
+        *(tuple(sorted(ids)) for ids in (
+            filter.rating, filter.char, filter.char_all, filter.char_none, filter.tag, filter.tag_all, filter.tag_none
+        )),
+    )
+
+
+def count_of(stmt: Select) -> Select:
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
 
 
 def count_videos(db: Session):
@@ -121,6 +480,42 @@ def delete_video(db: Session, id: int):
     db_video.deleted = True
 
 
+def find_src_urls(db: Session, urls: List[str]) -> Set[str]:
+    """
+    Returns the given source URLs that already have a video, including the deleted ones.
+    """
+    found = set()
+
+    # stay under SQLite's limit of variables
+    for i in range(0, len(urls), MAX_BATCH_SIZE):
+        found.update(db.execute(
+            select(models.Video.src_url).filter(models.Video.src_url.in_(urls[i:i + MAX_BATCH_SIZE]))
+        ).scalars())
+
+    return found
+
+
+# Catalogs
+
+
+def get_catalog(db: Session, table: str) -> Tuple[bytes, str]:
+    """
+    Returns the whole table serialized as JSON, and its ETag.
+    """
+    cached = serialized_catalogs.get(table)
+
+    if cached:
+        return cached
+
+    version = catalog.get_version(table)
+    load, schema = catalogs[table]
+
+    items = [schema.from_orm(obj).dict() for obj in load(db)]
+    body = json.dumps(items, separators=(',', ':'), ensure_ascii=False).encode()
+
+    return serialized_catalogs.set(table, version, body)
+
+
 # Person
 
 
@@ -172,6 +567,8 @@ def add_video_char(db: Session, video_id: int, char_id: int):
     clause = models.video_char_table.insert().values(
         video_id=video_id, char_id=char_id)
     db.execute(clause)
+    mark_changed(db, 'video_char', video_id=video_id)
+    record(db, 'char', video_id, char_id, True)
 
 
 def remove_video_char(db: Session, video_id: int, char_id: int):
@@ -183,6 +580,8 @@ def remove_video_char(db: Session, video_id: int, char_id: int):
         & (models.video_char_table.c.char_id == char_id)
     )
     db.execute(clause)
+    mark_changed(db, 'video_char', video_id=video_id)
+    record(db, 'char', video_id, char_id, False)
 
 
 def exist_video_char(db: Session, video_id: int, char_id: int) -> bool:
@@ -220,6 +619,8 @@ def add_video_tag(db: Session, video_id: int, tag_id: int):
 
     clause = models.video_tag_table.insert().values(video_id=video_id, tag_id=tag_id)
     db.execute(clause)
+    mark_changed(db, 'video_tag', video_id=video_id)
+    record(db, 'tag', video_id, tag_id, True)
 
 
 def remove_video_tag(db: Session, video_id: int, tag_id: int):
@@ -231,6 +632,8 @@ def remove_video_tag(db: Session, video_id: int, tag_id: int):
         & (models.video_tag_table.c.tag_id == tag_id)
     )
     db.execute(clause)
+    mark_changed(db, 'video_tag', video_id=video_id)
+    record(db, 'tag', video_id, tag_id, False)
 
 
 def exist_video_tag(db: Session, video_id: int, tag_id: int) -> bool:
@@ -239,3 +642,170 @@ def exist_video_tag(db: Session, video_id: int, tag_id: int) -> bool:
             .filter_by(video_id=video_id, tag_id=tag_id)
             .first()
     )
+
+
+catalogs = {
+    'people': (get_people, schemas.Person),
+    'chars': (get_chars, schemas.Character),
+    'tags': (get_tags, schemas.Tag),
+}
+
+
+# Bulk
+
+
+# the join table, the column and the model of each kind of links to videos
+LINKS = {
+    'char': (models.video_char_table, 'char_id', models.Character),
+    'tag': (models.video_tag_table, 'tag_id', models.Tag),
+}
+
+
+def update_video_links(db: Session, kind: str, video_ids: List[int], add: List[int], remove: List[int]) -> List[dict]:
+    """
+    Adds and removes the chars or tags of many videos with set-based statements, and reports the result
+    of each (video, char or tag) pair.
+    """
+    table, key, model = LINKS[kind]
+
+    video_ids = list(dict.fromkeys(video_ids))
+    add = list(dict.fromkeys(add))
+    remove = list(dict.fromkeys(remove))
+
+    if len(video_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'Too many videos, at most {MAX_BATCH_SIZE} are allowed.')
+
+    if set(add) & set(remove):
+        raise ValueError('Cannot add and remove the same ID.')
+
+    ids = add + remove
+
+    existing_videos = set(db.execute(select(models.Video.id).where(models.Video.id.in_(video_ids))).scalars())
+    existing_ids = set(db.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+    linked = set(
+        db.execute(
+            select(table.c.video_id, table.c[key]).where(table.c.video_id.in_(video_ids), table.c[key].in_(ids))
+        ).all()
+    )
+
+    results = []
+    to_add = []
+    to_remove = []
+
+    for video_id in video_ids:
+        for id in ids:
+            pair = (video_id, id)
+
+            if video_id not in existing_videos or id not in existing_ids:
+                status = 'not_found'
+            elif id in add:
+                status = 'exists' if pair in linked else 'added'
+
+                if status == 'added':
+                    to_add.append(pair)
+            else:
+                status = 'removed' if pair in linked else 'not_linked'
+
+                if status == 'removed':
+                    to_remove.append(pair)
+
+            results.append({'video_id': video_id, 'id': id, 'status': status})
+
+    if to_add:
+        db.execute(table.insert().prefix_with('OR IGNORE'), [{'video_id': v, key: i} for v, i in to_add])
+
+    if to_remove:
+        # the linked pairs in the product are exactly the ones to remove, and this needs far fewer parameters
+        db.execute(table.delete().where(
+            table.c.video_id.in_({v for v, _ in to_remove}),
+            table.c[key].in_({i for _, i in to_remove}),
+        ))
+
+    for pairs, present in ((to_add, True), (to_remove, False)):
+        for video_id, id in pairs:
+            mark_changed(db, table.name, video_id=video_id)
+            record(db, kind, video_id, id, present)
+
+    return results
+
+
+def update_videos(db: Session, ids: List[int], items: dict) -> List[dict]:
+    """
+    Updates many videos in a single statement, and reports the result of each video.
+    """
+    ids = list(dict.fromkeys(ids))
+
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'Too many IDs, at most {MAX_BATCH_SIZE} are allowed.')
+
+    columns = dict.fromkeys(['id', 'deleted', 'creator_id', 'rating', *items])
+
+    rows = db.execute(
+        select(*(getattr(models.Video, column) for column in columns)).where(models.Video.id.in_(ids))
+    ).all()
+
+    found = {row.id for row in rows}
+
+    # the videos already having the values are left alone
+    changed = [row for row in rows if any(getattr(row, name) != value for name, value in items.items())]
+
+    if changed:
+        db.execute(
+            update(models.Video)
+            .where(models.Video.id.in_([row.id for row in changed]))
+            .values(**items)
+            .execution_options(synchronize_session=False)
+        )
+
+        # not flushed by the ORM, so the changes must be recorded here
+        if set(items) & set(CANDIDATE_COLUMNS):
+            mark_candidates_changed(db)
+
+        for row in changed:
+            mark_changed(db, models.Video.__tablename__, video_id=row.id)
+            record(
+                db, 'video', row.id, row.deleted is None,
+                items.get('creator_id', row.creator_id), items.get('rating', row.rating)
+            )
+
+    changed_ids = {row.id for row in changed}
+
+    return [
+        {
+            'video_id': id,
+            'id': None,
+            'status': 'updated' if id in changed_ids else 'unchanged' if id in found else 'not_found',
+        }
+        for id in ids
+    ]
+
+
+# Query plans
+
+
+def check_query_plans() -> bool:
+    """
+    Checks that the hot queries are served by the indexes, logs the ones that scan whole tables.
+    """
+    tables = ['videos', 'video_char', 'video_tag']
+
+    stmts = {
+        'videos by search': select_videos(schemas.VideoFilter(search='a')),
+        'videos by creator': select_videos(schemas.VideoFilter(creator_id=1)),
+        'videos by char': select_videos(schemas.VideoFilter(char=[1, 2])),
+        'videos by tag': select_videos(schemas.VideoFilter(tag_all=[1, 2], tag_none=[3])),
+        'latest videos': order_videos(select_videos(schemas.VideoFilter()), 'created').limit(100),
+        'random candidates': select_random_candidates(),
+    }
+
+    ok = True
+
+    for name, stmt in stmts.items():
+        full_scans = find_full_scans(stmt, tables)
+
+        if full_scans:
+            logger.warn(f'Query of {name} is not using indexes:', *full_scans)
+            ok = False
+
+    return ok
@@ -0,0 +1,91 @@
+from typing import Tuple, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from christina.db import RecordNotFound
+from . import models, schemas
+from .cache import totals, catalog
+from .bitmap import bitmap_index, count_bits
+from .crud import video_load_options, select_videos, count_of, select_random_candidates, page_videos, \
+    get_next_cursor, get_total_key, is_searching, page_videos_by_bitmap, select_facets, to_facets, get_load_options, \
+    select_videos_by_ids, sort_by_ids
+from .shuffle import random_index, shuffler
+
+
+# lazy loading is not possible with async sessions, so the relationships must always be loaded eagerly
+
+
+async def get_video(db: AsyncSession, id: int):
+    result = await db.execute(select(models.Video).filter_by(id=id).options(*video_load_options))
+    return result.scalars().first()
+
+
+async def get_random_video(db: AsyncSession, exclude: Optional[int], rating: Optional[int]):
+    await refresh_random_index(db)
+
+    id = random_index.pick(exclude, rating)
+
+    return await get_video(db, id) if id is not None else None
+
+
+async def get_shuffled_video(db: AsyncSession, session: str):
+    await refresh_random_index(db)
+
+    found, id = shuffler.next(session, random_index)
+
+    if not found:
+        raise RecordNotFound
+
+    return await get_video(db, id) if id is not None else None
+
+
+async def refresh_random_index(db: AsyncSession):
+    if random_index.stale:
+        version = random_index.changes
+        random_index.load((await db.execute(select_random_candidates())).all(), version)
+
+
+async def get_videos(
+        db: AsyncSession,
+        filter: schemas.VideoFilter,
+        *,
+        offset: int,
+        limit: int,
+        order: str,
+        cursor: Optional[str] = None,
+        fields: Optional[Set[str]] = None
+) -> Tuple[List[models.Video], int, Optional[str]]:
+    if not is_searching(filter.search) and bitmap_index.ensure_built():
+        stmt, total = page_videos_by_bitmap(filter, order=order, offset=offset, limit=limit, cursor=cursor)
+    else:
+        stmt = select_videos(filter)
+
+        key = get_total_key(filter)
+        total = totals.get(key)
+
+        if total is None:
+            version = catalog.version
+            total = (await db.execute(count_of(stmt))).scalar()
+            totals.set(key, total, version)
+
+        stmt = page_videos(stmt, search=filter.search, order=order, offset=offset, limit=limit, cursor=cursor)
+
+    db_videos = (await db.execute(stmt.options(*get_load_options(fields, order)))).scalars().all()
+
+    return db_videos, total, get_next_cursor(db_videos, search=filter.search, order=order, limit=limit)
+
+
+async def get_videos_by_ids(db: AsyncSession, ids: List[int], fields: Optional[Set[str]] = None) -> List[models.Video]:
+    result = await db.execute(select_videos_by_ids(ids, fields))
+
+    return sort_by_ids(result.scalars().all(), ids)
+
+
+async def get_facets(db: AsyncSession, filter: schemas.VideoFilter) -> dict:
+    if not is_searching(filter.search) and bitmap_index.ensure_built():
+        bitmap = bitmap_index.query(filter)
+
+        return {'total': count_bits(bitmap), **bitmap_index.get_facets(bitmap)}
+
+    return to_facets((await db.execute(select_facets(filter))).all())
@@ -0,0 +1,253 @@
+import os
+import secrets
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+from threading import Lock, Thread
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from christina.db import get_read_db_ctx, writer
+from christina.env import DEV_MODE
+from christina.logger import get_logger
+from christina.net import downloader
+from christina.net.scheduler import PRIORITY_NORMAL, PRIORITY_BULK
+from . import crud, models, parser, schemas, tools
+
+logger = get_logger(__name__)
+
+# processes that parse the pages, defaults to the number of CPUs
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', 0)) or None
+
+# how many jobs to keep for their progress to be read
+MAX_JOBS = 50
+
+executor: Optional[ProcessPoolExecutor] = None
+executor_lock = Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+
+    with executor_lock:
+        if not executor:
+            # spawned rather than forked, a fork would inherit the locks held by the other threads of the server
+            executor = ProcessPoolExecutor(IMPORT_WORKERS, mp_context=get_context('spawn'))
+
+        return executor
+
+
+def add_video(
+        db: Session,
+        type: str,
+        info: parser.VideoInfo,
+        priority: int = PRIORITY_NORMAL
+) -> Tuple[models.Video, List[downloader.Downloadable]]:
+    """
+    Creates a video from the parsed page, returns it with the targets to download its files.
+    """
+    creator_id = None
+
+    if info.creator_name:
+        person = crud.find_or_create_person(db, name=info.creator_name, url=info.creator_url)
+
+        creator_id = person.id
+
+    video = schemas.VideoBase(
+        type=type,
+        creator_id=creator_id,
+        src_url=info.src_url,
+        title=info.title,
+        uploaded=datetime.fromtimestamp(info.uploaded_time),
+        video_dl_url=info.url,
+        thumb_dl_url=info.thumb_url,
+    )
+
+    db_video = crud.create_video(db, video)
+
+    file = tools.get_video_file(db_video, info.ext)
+    thumb_file = tools.get_thumb_file(db_video, info.thumb_ext)
+
+    crud.update_video(db, db_video, {
+        'file': file,
+        'thumb_file': thumb_file,
+    })
+
+    video_dl_target = downloader.Downloadable(
+        url=video.video_dl_url,
+        file=file,
+        name=video.title,
+        use_proxy=True,
+        priority=priority,
+        meta={
+            'video_id': db_video.id,
+            'type': 'video'
+        }
+    )
+    thumb_dl_target = downloader.Downloadable(
+        url=video.thumb_dl_url,
+        file=thumb_file,
+        name=video.title,
+        use_proxy=True,
+        priority=priority,
+        meta={
+            'video_id': db_video.id,
+            'type': 'image'
+        }
+    )
+
+    if DEV_MODE:
+        video_dl_target.url = 'http://127.0.0.1/test.mp4'
+        thumb_dl_target.url = 'http://127.0.0.1/test.jpg'
+
+    return db_video, [video_dl_target, thumb_dl_target]
+
+
+class ImportJob:
+    """
+    Imports many videos in the background: the pages are parsed in a process pool, then all the videos
+    are created in one transaction and their downloads are queued at once.
+    """
+
+    def __init__(self, sources: List[schemas.VideoCreate]):
+        self.id = secrets.token_urlsafe(8)
+        self.state = 'parsing'
+
+        self.sources = sources
+        self.total = len(sources)
+
+        self.parsed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.created = 0
+
+        self.errors: List[dict] = []
+        self.video_ids: List[int] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed')
+
+    def start(self):
+        Thread(name='ImportJob', target=self.run, daemon=True).start()
+
+    def run(self):
+        try:
+            sources = self.dedupe(self.sources)
+            infos = self.parse(sources)
+
+            self.state = 'saving'
+
+            # the job may be run twice if its batch fails, so the counters are only updated with the result
+            video_ids, skipped, targets = writer.submit(lambda db: self.save(db, infos)).result()
+
+            self.video_ids = video_ids
+            self.created = len(video_ids)
+            self.skipped += skipped
+
+            downloader.add_all(targets)
+
+            self.state = 'done'
+
+            logger.info(f'Import {self.id} done, {self.created} created, {self.skipped} skipped, {self.failed} failed')
+
+        except Exception as e:
+            logger.warn(f'Import {self.id} failed.')
+            logger.exception(e)
+
+            self.state = 'failed'
+
+        finally:
+            # the pages are no longer needed
+            self.sources = []
+
+    def dedupe(self, sources: List[schemas.VideoCreate]) -> List[schemas.VideoCreate]:
+        unique = list({source.url: source for source in sources}.values())
+
+        with get_read_db_ctx() as db:
+            existing = crud.find_src_urls(db, [source.url for source in unique])
+
+        unique = [source for source in unique if source.url not in existing]
+
+        self.skipped = len(sources) - len(unique)
+
+        return unique
+
+    def parse(self, sources: List[schemas.VideoCreate]) -> List[Tuple[str, parser.VideoInfo]]:
+        pool = get_executor()
+
+        # only plain strings are sent to the workers, they never import the schemas
+        futures = {
+            pool.submit(parser.parse_video_page, source.type, source.url, source.html): source
+            for source in sources
+        }
+
+        infos = []
+
+        for future in as_completed(futures):
+            source = futures[future]
+
+            try:
+                infos.append((source.type, future.result()))
+                self.parsed += 1
+            except Exception as e:
+                self.errors.append({'url': source.url, 'error': str(e) or repr(e)})
+                self.failed += 1
+
+        return infos
+
+    @staticmethod
+    def save(
+            db: Session,
+            infos: List[Tuple[str, parser.VideoInfo]]
+    ) -> Tuple[List[int], int, List[downloader.Downloadable]]:
+        # another request may have added some of them meanwhile
+        existing = crud.find_src_urls(db, [info.src_url for _, info in infos])
+
+        video_ids = []
+        targets = []
+
+        for type, info in infos:
+            if info.src_url in existing:
+                continue
+
+            existing.add(info.src_url)
+
+            db_video, video_targets = add_video(db, type, info, PRIORITY_BULK)
+
+            video_ids.append(db_video.id)
+            targets += video_targets
+
+        return video_ids, len(infos) - len(video_ids), targets
+
+
+class Importer:
+    def __init__(self, max_jobs: int = MAX_JOBS):
+        self.max_jobs = max_jobs
+        self.jobs: OrderedDict[str, ImportJob] = OrderedDict()
+        self.lock = Lock()
+
+    def start(self, sources: List[schemas.VideoCreate]) -> ImportJob:
+        job = ImportJob(sources)
+
+        with self.lock:
+            self.jobs[job.id] = job
+
+            # drop the oldest finished ones
+            excess = max(len(self.jobs) - self.max_jobs, 0)
+
+            for id in [id for id, old in self.jobs.items() if old.finished][:excess]:
+                del self.jobs[id]
+
+        job.start()
+
+        return job
+
+    def get(self, id: str) -> Optional[ImportJob]:
+        with self.lock:
+            return self.jobs.get(id)
+
+
+importer = Importer()
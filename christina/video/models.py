@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Boolean, Integer, String, Enum, DateTime, Table, ForeignKey
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import table, column
 
 from christina.db import Base
 
@@ -70,3 +71,16 @@ video_tag_table = Table(
     Column('video_id', Integer, ForeignKey('videos.id'), primary_key=True),
     Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
 )
+
+# the FTS5 index of videos, created and kept in sync by the triggers in the migrations;
+# the column named after the table matches all the columns
+videos_fts_table = table(
+    'videos_fts',
+    column('rowid'),
+    column('rank'),
+    column('videos_fts'),
+    column('title'),
+    column('creator'),
+    column('tags'),
+    column('chars'),
+)
@@ -1,12 +1,15 @@
-import re
-import urllib.parse
+import importlib
+import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Dict, Optional, TYPE_CHECKING
 
-from scrapy.selector import Selector
+from christina.logger import get_logger
 
-from christina import utils
-from . import schemas
+if TYPE_CHECKING:
+    # only for the annotations, the schemas pull in the downloader, which the import workers should not start
+    from . import schemas
+
+logger = get_logger(__name__)
 
 
 @dataclass
@@ -22,57 +25,54 @@ class VideoInfo:
     creator_url: Optional[str] = None
 
 
-def parse_video_source(source: schemas.VideoCreate) -> VideoInfo:
-    if source.type == 'i':
-        return parse_iwara_page(source.url, source.html)
-    else:
-        raise TypeError('Unknown video type.')
+# receives the URL and the HTML of a page
+Parser = Callable[[str, str], VideoInfo]
+
+# modules by the type of videos, each one has a parse() as above and is only imported on the first use
+PARSERS: Dict[str, str] = {
+    'i': 'christina.video.parsers.iwara',
+}
+
+
+def read_parsers(config: str) -> Dict[str, str]:
+    """
+    Reads the parsers of other sites, one per line: <type> <module>
+    """
+    parsers = {}
+
+    for line in filter(None, map(str.strip, config.splitlines())):
+        parts = line.split()
 
+        # a typo shouldn't keep the server from starting
+        if len(parts) != 2:
+            logger.warn(f'Ignoring invalid parser "{line}", expected "<type> <module>"')
+            continue
 
-def parse_iwara_page(url: str, html: str) -> VideoInfo:
-    selector = Selector(text=html)
+        parsers[parts[0]] = parts[1]
 
-    title = selector.css('.node-info .title::text').get()
+    return parsers
 
-    thumb_url = selector.css('#video-player::attr(poster)').get()
 
-    # e.g. /users/artypencil
-    creator_url = selector.css('.node-info .username::attr(href)').get()
+PARSERS.update(read_parsers(os.getenv('VIDEO_PARSERS', '')))
 
-    creator_name = selector.css('.node-info .username::text').get()
+loaded: Dict[str, Parser] = {}
 
-    download_urls = selector.css('#download-options li:first-child a::attr(href)').getall()
 
-    # e.g.
-    # //galaco.iwara.tv/file.php?expire=1612634059&hash=71c6e02e2958ea9ddc8e0fa708f640bd20acf118
-    # &file=2021%2F01%2F09%2F1610163870_No7lRIgR5YFp5vlpJ_Source.mp4&op=dl&r=0
-    download_url = next((link for link in download_urls if 'Source' in link), None)
+def parse_video_source(source: 'schemas.VideoCreate') -> VideoInfo:
+    return parse_video_page(source.type, source.url, source.html)
 
-    if not download_url:
-        raise ValueError('Could not find download URL for Source resolution.')
 
-    file = re.search(r'file=([^&]+)', download_url)[1]
+def parse_video_page(type: str, url: str, html: str) -> VideoInfo:
+    return get_parser(type)(url, html)
 
-    # e.g. 2021/01/09/1610163870_No7lRIgR5YFp5vlpJ_Source.mp4
-    file = urllib.parse.unquote(file)
 
-    filename = file[file.rindex('/') + 1:]
+def get_parser(type: str) -> Parser:
+    parse = loaded.get(type)
 
-    uploaded_time = int(filename.split('_')[0])
+    if not parse:
+        if type not in PARSERS:
+            raise TypeError('Unknown video type.')
 
-    # resolve relative URLs
-    thumb_url = urllib.parse.urljoin(url, thumb_url)
-    creator_url = urllib.parse.urljoin(url, creator_url)
-    download_url = urllib.parse.urljoin(url, download_url)
+        parse = loaded[type] = importlib.import_module(PARSERS[type]).parse
 
-    return VideoInfo(
-        src_url=url,
-        url=download_url,
-        ext=utils.get_extension(filename),
-        title=title,
-        thumb_url=thumb_url,
-        thumb_ext=utils.get_extension(thumb_url),
-        uploaded_time=uploaded_time,
-        creator_name=creator_name,
-        creator_url=creator_url,
-    )
+    return parse
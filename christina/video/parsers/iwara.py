@@ -0,0 +1,82 @@
+import re
+import urllib.parse
+from typing import List, Optional
+
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+from christina import utils
+from christina.video.parser import VideoInfo
+
+# compiled once, translating CSS to XPath costs more than running it
+TITLE = CSSSelector('.node-info .title')
+PLAYER = CSSSelector('#video-player')
+USERNAME = CSSSelector('.node-info .username')
+DOWNLOAD_LINKS = CSSSelector('#download-options li:first-child a')
+
+
+def get_text(elements: List) -> Optional[str]:
+    # the first text node directly in any of the elements, like "::text" in Scrapy
+    for element in elements:
+        texts = element.xpath('text()')
+
+        if texts:
+            # plain strings, the "smart" ones keep the whole tree alive
+            return str(texts[0])
+
+    return None
+
+
+def get_attr(elements: List, name: str) -> Optional[str]:
+    return next((element.get(name) for element in elements if element.get(name) is not None), None)
+
+
+def parse(url: str, html: str) -> VideoInfo:
+    doc = lxml.html.fromstring(html)
+
+    title = get_text(TITLE(doc))
+
+    thumb_url = get_attr(PLAYER(doc), 'poster')
+
+    usernames = USERNAME(doc)
+
+    # e.g. /users/artypencil
+    creator_url = get_attr(usernames, 'href')
+
+    creator_name = get_text(usernames)
+
+    download_urls = [link.get('href') for link in DOWNLOAD_LINKS(doc) if link.get('href') is not None]
+
+    # e.g.
+    # //galaco.iwara.tv/file.php?expire=1612634059&hash=71c6e02e2958ea9ddc8e0fa708f640bd20acf118
+    # &file=2021%2F01%2F09%2F1610163870_No7lRIgR5YFp5vlpJ_Source.mp4&op=dl&r=0
+    download_url = next((link for link in download_urls if 'Source' in link), None)
+
+    if not download_url:
+        raise ValueError('Could not find download URL for Source resolution.')
+
+    file = re.search(r'file=([^&]+)', download_url)[1]
+
+    # e.g. 2021/01/09/1610163870_No7lRIgR5YFp5vlpJ_Source.mp4
+    file = urllib.parse.unquote(file)
+
+    filename = file[file.rindex('/') + 1:]
+
+    uploaded_time = int(filename.split('_')[0])
+
+    # resolve relative URLs
+    thumb_url = urllib.parse.urljoin(url, thumb_url)
+    creator_url = urllib.parse.urljoin(url, creator_url)
+    download_url = urllib.parse.urljoin(url, download_url)
+
+    return VideoInfo(
+        src_url=url,
+        url=download_url,
+        ext=utils.get_extension(filename),
+        title=title,
+        thumb_url=thumb_url,
+        thumb_ext=utils.get_extension(thumb_url),
+        uploaded_time=uploaded_time,
+        creator_name=creator_name,
+        creator_url=creator_url,
+    )
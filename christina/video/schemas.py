@@ -1,10 +1,20 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, validator
 
 from christina import net
 
+# the most videos that a batch request can cover
+MAX_BATCH_SIZE = 500
+
+
+def check_batch_size(ids: List[int]) -> List[int]:
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'Too many IDs, at most {MAX_BATCH_SIZE} are allowed.')
+
+    return ids
+
 
 class VideoBase(BaseModel):
     type: str
@@ -59,11 +69,124 @@ class VideoCreate(BaseModel):
 class VideoUpdate(BaseModel):
     rating: Optional[int] = None
 
+    @validator('rating')
+    def check_rating(cls, v):
+        # may be left out, but not cleared
+        if v is None:
+            raise ValueError('Rating cannot be null.')
+
+        return v
+
+
+class VideoBulkUpdate(BaseModel):
+    ids: List[int]
+    update: VideoUpdate
+
+    _check_ids = validator('ids', allow_reuse=True)(check_batch_size)
+
+    @validator('update')
+    def check_update(cls, v):
+        if not v.__fields_set__:
+            raise ValueError('Nothing to update.')
+
+        return v
+
+
+class VideoLinksUpdate(BaseModel):
+    video_ids: List[int]
+
+    # IDs of the chars or tags
+    add: List[int] = []
+    remove: List[int] = []
+
+    _check_video_ids = validator('video_ids', allow_reuse=True)(check_batch_size)
+
+    @validator('remove')
+    def check_remove(cls, v, values):
+        if set(v) & set(values.get('add', [])):
+            raise ValueError('Cannot add and remove the same ID.')
+
+        return v
+
+
+class BulkResult(BaseModel):
+    video_id: int
+
+    # ID of the char or tag, if any
+    id: Optional[int] = None
+
+    # added, exists, removed, not_linked, updated, unchanged or not_found
+    status: str
+
+
+class VideoImport(BaseModel):
+    sources: List[VideoCreate]
+
+
+class ImportFailure(BaseModel):
+    url: str
+    error: str
+
+
+class ImportJob(BaseModel):
+    id: str
+
+    # parsing, saving, done or failed
+    state: str
+
+    total: int
+    parsed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    created: int = 0
+
+    errors: List[ImportFailure] = []
+    video_ids: List[int] = []
+
+    class Config:
+        orm_mode = True
+
+
+class VideoFilter(BaseModel):
+    search: Optional[str] = None
+    creator_id: Optional[int] = None
+
+    # any of these ratings
+    rating: List[int] = []
+
+    # the videos must have any of, all of, or none of these chars and tags
+    char: List[int] = []
+    char_all: List[int] = []
+    char_none: List[int] = []
+    tag: List[int] = []
+    tag_all: List[int] = []
+    tag_none: List[int] = []
+
+
+class VideoFacets(BaseModel):
+    total: int
+
+    # numbers of the matched videos by the IDs of tags, chars and creators, and by ratings
+    tags: Dict[int, int]
+    chars: Dict[int, int]
+    creators: Dict[int, int]
+    ratings: Dict[int, int]
+
+
+class ShuffleSession(BaseModel):
+    session: str
+
+    # number of videos to go through before any of them repeats
+    total: int
+
 
 class VideoList(BaseModel):
     list: List[Video]
     total: int
 
+    # cursor of the next page, none if it's the last page or the order doesn't support it
+    next: Optional[str] = None
+
 
 class PersonBase(BaseModel):
     name: str
@@ -0,0 +1,119 @@
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from christina import utils
+from christina.net.static import STATIC_SERVER, STATIC_DIR, static_url
+from . import models
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+# parts of a path that urljoin() would resolve, in which case the URL can't simply be concatenated
+UNSAFE_PATH_PARTS = ('..', './', '//', ':', '?', '#')
+
+
+def get_static_url(path: Optional[str]) -> Optional[str]:
+    """
+    Same as static_url() but skips urljoin() for plain relative paths, which are the most of them.
+    """
+    if path is None:
+        return None
+
+    if STATIC_DIR in path:
+        path = path.replace(STATIC_DIR, '')
+
+    if not STATIC_SERVER.endswith('/') or path.startswith(('/', '.')) or any(
+            part in path for part in UNSAFE_PATH_PARTS
+    ):
+        return static_url(path)
+
+    return STATIC_SERVER + path
+
+
+def to_timestamp(dt: Optional[datetime]) -> Optional[int]:
+    # the same as the datetime encoder set in christina.db
+    return utils.timestamp(dt) if dt else None
+
+
+def serialize_named(obj) -> dict:
+    return {'name': obj.name, 'alias': obj.alias, 'id': obj.id}
+
+
+def serialize_person(person: Optional[models.Person]) -> Optional[dict]:
+    return {'name': person.name, 'url': person.url, 'id': person.id} if person else None
+
+
+# getters of the fields in schemas.Video, in the same order
+FIELDS: Dict[str, Callable[[models.Video], Any]] = {
+    'type': lambda video: video.type,
+    'src_url': lambda video: video.src_url,
+    'title': lambda video: video.title,
+    'uploaded': lambda video: to_timestamp(video.uploaded),
+    'rating': lambda video: video.rating,
+    'deleted': lambda video: video.deleted,
+    'file': lambda video: video.file,
+    'thumb_file': lambda video: video.thumb_file,
+    'video_dl_url': lambda video: video.video_dl_url,
+    'thumb_dl_url': lambda video: video.thumb_dl_url,
+    'video_dl_id': lambda video: video.video_dl_id,
+    'thumb_dl_id': lambda video: video.thumb_dl_id,
+    'creator_id': lambda video: video.creator_id,
+    'id': lambda video: video.id,
+    'created': lambda video: to_timestamp(video.created),
+    'url': lambda video: get_static_url(video.file),
+    'thumb': lambda video: get_static_url(video.thumb_file),
+    'creator': lambda video: serialize_person(video.creator),
+    'chars': lambda video: [serialize_named(char) for char in video.chars],
+    'tags': lambda video: [serialize_named(tag) for tag in video.tags],
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """
+    Parses a list of fields like "id,title,thumb", None means all the fields.
+    """
+    if not fields:
+        return None
+
+    names = set(fields.split(','))
+
+    invalid = names - FIELDS.keys()
+
+    if invalid:
+        raise ValueError('Invalid fields: ' + ','.join(sorted(invalid)))
+
+    # always needed to tell the videos apart
+    names.add('id')
+
+    return names
+
+
+def serialize_video(video: models.Video, fields: Optional[Set[str]] = None) -> dict:
+    """
+    Builds the same dict as schemas.Video, without validating what's just been read from the database.
+    """
+    return {name: get(video) for name, get in FIELDS.items() if fields is None or name in fields}
+
+
+def serialize_video_list(
+        videos: List[models.Video],
+        total: int,
+        next: Optional[str],
+        fields: Optional[Set[str]] = None
+) -> bytes:
+    return dumps({
+        'list': [serialize_video(video, fields) for video in videos],
+        'total': total,
+        'next': next,
+    })
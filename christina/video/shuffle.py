@@ -0,0 +1,210 @@
+import random
+import secrets
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import chain
+from threading import Lock
+from time import time
+from typing import Dict, Optional, Iterable, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import models
+
+# the columns deciding whether a video can be picked, and from which pool
+CANDIDATE_COLUMNS = ('deleted', 'video_dl_id', 'thumb_dl_id', 'rating')
+
+
+def contains(ids: array, id: int) -> bool:
+    i = bisect_left(ids, id)
+    return i < len(ids) and ids[i] == id
+
+
+class RandomIndex:
+    """
+    Dense arrays of the IDs of playable videos, one for all and one for each rating, so a random video
+    can be picked without sorting the table. Reloaded only when a change may have added, removed or moved
+    a candidate, the edits of titles, tags and such don't affect it.
+    """
+
+    def __init__(self):
+        self.version = -1
+
+        # bumped by every committed change to the candidates
+        self.changes = 0
+
+        # None as the key for all the videos, the IDs are sorted for binary searches
+        self.pools: Dict[Optional[int], array] = {None: array('q')}
+
+        self.lock = Lock()
+
+    @property
+    def stale(self) -> bool:
+        return self.version != self.changes
+
+    def invalidate(self):
+        with self.lock:
+            self.changes += 1
+
+    def load(self, rows: Iterable[Tuple[int, int]], version: int):
+        """
+        Replaces the pools with given (id, rating) rows in ascending order of ID, which were fetched at given version.
+        """
+        pools: Dict[Optional[int], array] = {None: array('q')}
+
+        for id, rating in rows:
+            pools[None].append(id)
+            pools.setdefault(rating, array('q')).append(id)
+
+        with self.lock:
+            # arrays are never modified after loading, so the sessions can keep a reference to them
+            self.pools = pools
+            self.version = version
+
+    def get_pool(self, rating: Optional[int]) -> array:
+        return self.pools.get(rating, array('q'))
+
+    def pick(self, exclude: Optional[int], rating: Optional[int]) -> Optional[int]:
+        pool = self.get_pool(rating)
+
+        if not pool:
+            return None
+
+        id = random.choice(pool)
+
+        if id == exclude and len(pool) > 1:
+            # the excluded one is at most one of the others, so pick again from the rest
+            i = random.randrange(len(pool) - 1)
+            id = pool[i if pool[i] != exclude else len(pool) - 1]
+
+        return id
+
+
+class ShuffleSession:
+    """
+    Walks through a shuffled pool with a lazy Fisher-Yates shuffle, so no video repeats until all of them
+    have been played, and only the swapped positions are stored.
+    """
+
+    def __init__(self, rating: Optional[int]):
+        self.rating = rating
+        self.pool = array('q')
+        self.swaps: Dict[int, int] = {}
+        self.position = 0
+        self.cycle = 0
+        self.used_at = time()
+
+    def draw(self) -> int:
+        i = self.position
+        j = random.randrange(i, len(self.pool))
+
+        drawn = self.swaps.pop(j, self.pool[j])
+
+        if j != i:
+            self.swaps[j] = self.swaps.pop(i, self.pool[i])
+
+        self.position += 1
+
+        return drawn
+
+    def next(self, index: RandomIndex) -> Optional[int]:
+        self.used_at = time()
+
+        current = index.get_pool(self.rating)
+
+        # a new cycle starts with the latest pool, the videos added meanwhile are included by then
+        for _ in range(2):
+            while self.position < len(self.pool):
+                id = self.draw()
+
+                # skip the ones that have been deleted since the cycle started
+                if current is self.pool or contains(current, id):
+                    return id
+
+            if not current:
+                return None
+
+            self.pool = current
+            self.swaps = {}
+            self.position = 0
+            self.cycle += 1
+
+        return None
+
+
+class Shuffler:
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600):
+        self.max_sessions = max_sessions
+
+        # seconds of idle time before a session expires
+        self.ttl = ttl
+
+        self.sessions: OrderedDict[str, ShuffleSession] = OrderedDict()
+        self.lock = Lock()
+
+    def create(self, rating: Optional[int]) -> str:
+        token = secrets.token_urlsafe(12)
+
+        with self.lock:
+            self.sessions[token] = ShuffleSession(rating)
+
+            # drop the least recently used ones
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+        return token
+
+    def next(self, token: str, index: RandomIndex) -> Tuple[bool, Optional[int]]:
+        """
+        Returns whether the session exists, and the next ID in it.
+        """
+        with self.lock:
+            session = self.sessions.get(token)
+
+            if not session or time() - session.used_at > self.ttl:
+                self.sessions.pop(token, None)
+                return False, None
+
+            self.sessions.move_to_end(token)
+
+            return True, session.next(index)
+
+
+random_index = RandomIndex()
+shuffler = Shuffler()
+
+
+def mark_candidates_changed(db: Session):
+    """
+    Marks the candidates as changed by a statement that doesn't go through the ORM.
+    """
+    db.info['random_candidates_changed'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def on_flush(db: Session, flush_context):
+    for obj in chain(db.new, db.deleted):
+        if isinstance(obj, models.Video):
+            mark_candidates_changed(db)
+            return
+
+    for obj in db.dirty:
+        if isinstance(obj, models.Video):
+            attrs = inspect(obj).attrs
+
+            if any(attrs[column].history.has_changes() for column in CANDIDATE_COLUMNS):
+                mark_candidates_changed(db)
+                return
+
+
+@event.listens_for(Session, 'after_commit')
+def on_commit(db: Session):
+    if db.info.pop('random_candidates_changed', False):
+        random_index.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def on_rollback(db: Session):
+    db.info.pop('random_candidates_changed', None)
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+import pytest
+
+TEMP_DIR = tempfile.mkdtemp(prefix='christina-test-')
+
+# the modules read their configuration on import, so it must be in place before any of them is imported
+TEST_ENV = {
+    'DB_URL': 'sqlite:///' + os.path.join(TEMP_DIR, 'test.db'),
+    'STATIC_DIR': TEMP_DIR + '/',
+    'STATIC_SERVER': 'http://127.0.0.1/static/',
+    'ARIA2_RPC': 'http://127.0.0.1:6800/rpc',
+    'DOWNLOAD_BACKEND': 'http',
+    'PROXY': '',
+    'CORS_ORIGINS': '',
+}
+
+os.environ.update(TEST_ENV)
+
+# christina.env loads .env with override, a local one must not point the tests at a real database
+import christina.env
+
+os.environ.update(TEST_ENV)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    # all the models must have been imported before migrating
+    import christina.net.models
+    import christina.video.models
+    from christina.db.migrations import migrate
+
+    migrate()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import xmlrpc.client
+from threading import Thread
+from typing import Dict, List, Tuple
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+import websockets
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/rpc',)
+
+
+class FakeAria2:
+    """
+    A local stand-in for aria2, with the XML-RPC calls over HTTP and the notifications over a WebSocket.
+    """
+
+    def __init__(self):
+        # statuses by gid, as returned by aria2.tellStatus
+        self.downloads: Dict[str, dict] = {}
+
+        # every method called, including the ones inside multicalls
+        self.calls: List[Tuple[str, list]] = []
+
+        self.rpc = SimpleXMLRPCServer(
+            ('127.0.0.1', 0), RequestHandler, logRequests=False, allow_none=True)
+        self.rpc.register_multicall_functions()
+        self.rpc.register_function(self.tell_status, 'aria2.tellStatus')
+        self.rpc.register_function(self.add_uri, 'aria2.addUri')
+
+        self.rpc_url = f'http://127.0.0.1:{self.rpc.server_address[1]}/rpc'
+
+        self.loop = asyncio.new_event_loop()
+        self.clients = set()
+        self.ws_server = None
+        self.ws_url = ''
+
+    def start(self):
+        Thread(target=self.rpc.serve_forever, daemon=True).start()
+        Thread(target=self.loop.run_forever, daemon=True).start()
+
+        self.run(self.serve_ws())
+
+    def stop(self):
+        self.stop_ws()
+        self.rpc.shutdown()
+        self.rpc.server_close()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    async def serve_ws(self):
+        self.ws_server = await websockets.serve(self.handle_ws, '127.0.0.1', 0)
+        self.ws_url = f'ws://127.0.0.1:{next(iter(self.ws_server.sockets)).getsockname()[1]}/jsonrpc'
+
+    async def handle_ws(self, ws, *args):
+        self.clients.add(ws)
+
+        try:
+            await ws.wait_closed()
+        finally:
+            self.clients.discard(ws)
+
+    def stop_ws(self):
+        """
+        Drops the connected clients and refuses new ones, as if aria2's WebSocket had gone away.
+        """
+
+        async def close():
+            if self.ws_server:
+                self.ws_server.close()
+                self.ws_server = None
+
+            for ws in list(self.clients):
+                await ws.close()
+
+        self.run(close())
+
+    def notify(self, method: str, gid: str):
+        message = json.dumps({'jsonrpc': '2.0', 'method': method, 'params': [{'gid': gid}]})
+
+        async def broadcast():
+            for ws in list(self.clients):
+                await ws.send(message)
+
+        self.run(broadcast())
+
+    def tell_status(self, gid: str, keys: list) -> dict:
+        self.calls.append(('aria2.tellStatus', [gid, keys]))
+
+        if gid not in self.downloads:
+            raise xmlrpc.client.Fault(1, f'GID {gid} is not found')
+
+        return {key: value for key, value in self.downloads[gid].items() if key in keys}
+
+    def add_uri(self, uris: list, options: dict) -> str:
+        self.calls.append(('aria2.addUri', [uris, options]))
+
+        gid = f'{len(self.downloads) + 1:016x}'
+        self.downloads[gid] = {'gid': gid, 'status': 'active', 'totalLength': '0', 'completedLength': '0',
+                               'downloadSpeed': '0'}
+
+        return gid
+
+    def get_status_calls(self) -> List[str]:
+        return [params[0] for method, params in self.calls if method == 'aria2.tellStatus']
@@ -0,0 +1,80 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Thread
+from typing import List, Optional
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    server: 'FileServer'
+
+    def do_GET(self):
+        data = self.server.data
+        range_header = self.headers.get('Range')
+
+        self.server.ranges.append(range_header)
+
+        if range_header and self.server.accept_ranges:
+            # only the single ranges sent by the downloader, e.g. "bytes=100-" or "bytes=100-199"
+            start, _, end = range_header[len('bytes='):].partition('-')
+            start, end = int(start), int(end) if end else len(data) - 1
+
+            body = data[start:end + 1]
+
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+
+            if start and self.server.stalls:
+                self.server.stalls -= 1
+
+                # the headers, then nothing until the server is stopped
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.flush()
+                self.server.released.wait()
+                return
+        else:
+            body = data
+
+            self.send_response(200)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    Serves the same bytes at any path, with or without range requests.
+    The given number of range requests that don't start at 0 get stalled after their headers.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, data: bytes, accept_ranges: bool = True, stalls: int = 0):
+        super().__init__(('127.0.0.1', 0), RequestHandler)
+
+        self.data = data
+        self.accept_ranges = accept_ranges
+        self.stalls = stalls
+        self.released = Event()
+
+        # the Range header of every request, None if it had none
+        self.ranges: List[Optional[str]] = []
+
+        self.url = f'http://127.0.0.1:{self.server_address[1]}/file.bin'
+
+    def handle_error(self, request, client_address):
+        # the downloader closes the probe as soon as it has the headers
+        pass
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.released.set()
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,109 @@
+from time import sleep, time
+
+import pytest
+
+from christina.net import downloader
+from christina.net.aria2 import Aria2Backend
+from christina.net.metrics import Metrics
+from christina.net.registry import Downloadable, DownloadState, Registry
+from christina.net.scheduler import Scheduler
+from fake_aria2 import FakeAria2
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time() + timeout
+
+    while not condition():
+        if time() > deadline:
+            raise TimeoutError
+
+        sleep(0.01)
+
+
+@pytest.fixture
+def aria2(tmp_path, monkeypatch):
+    fake = FakeAria2()
+    fake.start()
+
+    backend = Aria2Backend(tmp_path, fake.rpc_url, fake.ws_url)
+    backend.notifier.retry_interval = 0.1
+    backend.on_notify = downloader.on_notify
+    backend.on_connection_change = downloader.on_connection_change
+
+    # the downloader's own thread must stay out of the way, the tests call update_status() themselves
+    update_status = downloader.update_status
+    monkeypatch.setattr(downloader, 'update_status', lambda: None)
+
+    monkeypatch.setattr(downloader, 'backend', backend)
+    monkeypatch.setattr(downloader, 'registry', Registry())
+    monkeypatch.setattr(downloader, 'scheduler', Scheduler(8, 2))
+    monkeypatch.setattr(downloader, 'metrics', Metrics())
+    monkeypatch.setattr(downloader, 'status_requested_at', 0.0)
+    downloader.notified_gids.clear()
+
+    backend.start()
+    wait_for(lambda: backend.push_mode)
+
+    yield fake, update_status
+
+    fake.stop()
+
+
+def add_downloads(fake: FakeAria2, *gids: str):
+    targets = []
+
+    for gid in gids:
+        fake.downloads[gid] = {'gid': gid, 'status': 'active', 'totalLength': '100', 'completedLength': '10',
+                               'downloadSpeed': '10'}
+
+        target = Downloadable(url=f'http://127.0.0.1/{gid}', file=gid, name=gid)
+        downloader.registry.add(target)
+        downloader.registry.bind(target, gid)
+        targets.append(target)
+
+    return targets
+
+
+@pytest.mark.parametrize('method, status, state', [
+    ('aria2.onDownloadComplete', 'complete', DownloadState.COMPLETE),
+    ('aria2.onDownloadError', 'error', DownloadState.ERROR),
+])
+def test_notification_triggers_targeted_status(aria2, method, status, state):
+    fake, update_status = aria2
+    a, b = add_downloads(fake, 'a', 'b')
+
+    # the first update after connecting is a full refresh, since notifications may have been missed before
+    update_status()
+    assert sorted(fake.get_status_calls()) == ['a', 'b']
+
+    fake.calls.clear()
+    fake.downloads['a']['status'] = status
+    fake.notify(method, 'a')
+
+    wait_for(lambda: 'a' in downloader.notified_gids)
+    update_status()
+
+    assert fake.get_status_calls() == ['a']
+    assert a.state == state
+    assert b.state == DownloadState.ACTIVE
+
+
+def test_falls_back_to_polling(aria2):
+    fake, update_status = aria2
+    add_downloads(fake, 'a', 'b')
+
+    update_status()
+
+    # without notifications, nothing is asked while pushing
+    fake.calls.clear()
+    update_status()
+    assert fake.get_status_calls() == []
+
+    fake.stop_ws()
+    wait_for(lambda: not downloader.push_mode())
+
+    # a full refresh was not due, the statuses are polled because the socket is down
+    downloader.last_full_refresh = time()
+    update_status()
+
+    assert sorted(fake.get_status_calls()) == ['a', 'b']
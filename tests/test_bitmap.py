@@ -0,0 +1,51 @@
+from christina.video.bitmap import BitmapIndex, count_bits, to_ids
+from christina.video.schemas import VideoFilter
+
+
+def create_index() -> BitmapIndex:
+    index = BitmapIndex()
+
+    # id, creator, rating, tags
+    for id, creator_id, rating, tags in (
+            (1, 1, 5, [1, 2]),
+            (2, 1, 3, [1]),
+            (3, 2, 5, [2, 3]),
+            (4, None, 0, []),
+            (5, 2, 4, [1, 3]),
+    ):
+        index.apply(('video', id, True, creator_id, rating))
+
+        for tag_id in tags:
+            index.apply(('tag', id, tag_id, True))
+
+    return index
+
+
+def query(index: BitmapIndex, **filter) -> list:
+    return to_ids(index.query(VideoFilter(**filter)))
+
+
+def test_query():
+    index = create_index()
+
+    assert query(index) == [1, 2, 3, 4, 5]
+    assert query(index, tag=[2, 3]) == [1, 3, 5]
+    assert query(index, tag_all=[1, 3]) == [5]
+    assert query(index, tag=[1], tag_none=[2]) == [2, 5]
+    assert query(index, creator_id=2) == [3, 5]
+    assert query(index, rating=[5]) == [1, 3]
+    assert query(index, rating=[4, 5], tag=[1]) == [1, 5]
+    assert query(index, rating=[1]) == []
+
+
+def test_changes():
+    index = create_index()
+
+    index.apply(('video', 1, True, 1, 2))
+    index.apply(('video', 3, False, None, None))
+    index.apply(('tag', 5, 3, False))
+
+    assert query(index, rating=[5]) == []
+    assert query(index, rating=[2]) == [1]
+    assert query(index, tag=[3]) == []
+    assert count_bits(index.query(VideoFilter())) == 4
@@ -0,0 +1,48 @@
+from christina.net.metrics import Metrics
+from christina.net.registry import Downloadable
+
+
+def status(gid: str, speed: int) -> dict:
+    return {'id': gid, 'status': 'active', 'downloadSpeed': str(speed), 'completedLength': '0', 'totalLength': '100'}
+
+
+def test_samples_do_not_depend_on_updates():
+    metrics = Metrics()
+    metrics.record_added([
+        Downloadable(id='a', url='http://127.0.0.1/a', file='a', name='a', use_proxy=True),
+        Downloadable(id='b', url='http://127.0.0.1/b', file='b', name='b'),
+    ])
+
+    metrics.record_update([status('a', 100), status('b', 50)], 0.01)
+    metrics.sample()
+
+    # a partial update, as in push mode, only changes what it covers
+    metrics.record_update([status('b', 20)], 0.01)
+    metrics.sample()
+
+    # no update at all in between, the latest speeds are sampled again
+    metrics.sample()
+
+    history = metrics.get_history()
+
+    assert len(history['time']) == 3
+    assert history['speed'] == [150, 120, 120]
+    assert history['proxied_speed'] == [100, 100, 100]
+    assert history['active'] == [2, 2, 2]
+    assert history['downloads']['a']['speed'] == [100, 100, 100]
+    assert history['downloads']['b']['speed'] == [50, 20, 20]
+
+    assert metrics.get_summary()['speed'] == 120
+
+
+def test_finished_downloads_leave_the_samples():
+    metrics = Metrics()
+    target = Downloadable(id='a', url='http://127.0.0.1/a', file='a', name='a')
+
+    metrics.record_added([target])
+    metrics.record_update([status('a', 100)], 0.01)
+    metrics.record_complete([target])
+    metrics.sample()
+
+    assert metrics.get_history()['speed'] == [0]
+    assert metrics.get_summary()['completed'] == 1
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from christina.db import Base, migrations
+
+
+def test_unique_names_merges_duplicates(tmp_path, monkeypatch):
+    engine = create_engine(f'sqlite:///{tmp_path}/duplicates.db')
+    monkeypatch.setattr(migrations, 'engine', engine)
+
+    # a database from before the names were unique
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql('PRAGMA user_version = 1')
+
+        for id in (1, 2, 3):
+            connection.exec_driver_sql(
+                'INSERT INTO videos (id, type, title, rating, uploaded) VALUES (?, ?, ?, 0, ?)',
+                (id, 'i', f'video {id}', datetime.now()))
+
+        connection.exec_driver_sql(
+            "INSERT INTO tags (id, name, alias) VALUES (1, 'dance', NULL), (2, 'dance', 'ダンス'), "
+            "(3, 'dance', NULL), (4, 'song', NULL)")
+        connection.exec_driver_sql('INSERT INTO video_tag (video_id, tag_id) VALUES (1, 1), (1, 2), (2, 3), (3, 4)')
+
+        connection.exec_driver_sql("INSERT INTO chars (id, name) VALUES (1, 'miku'), (2, 'miku')")
+        connection.exec_driver_sql('INSERT INTO video_char (video_id, char_id) VALUES (1, 2), (2, 1)')
+
+    migrations.migrate()
+
+    with engine.connect() as connection:
+        assert migrations.get_version(connection) == len(migrations.MIGRATIONS)
+
+        assert connection.exec_driver_sql('SELECT id, name, alias FROM tags ORDER BY id').fetchall() == [
+            (1, 'dance', 'ダンス'), (4, 'song', None),
+        ]
+        assert connection.exec_driver_sql('SELECT video_id, tag_id FROM video_tag ORDER BY 1, 2').fetchall() == [
+            (1, 1), (2, 1), (3, 4),
+        ]
+
+        assert connection.exec_driver_sql('SELECT id, name FROM chars').fetchall() == [(1, 'miku')]
+        assert connection.exec_driver_sql('SELECT video_id, char_id FROM video_char ORDER BY 1').fetchall() == [
+            (1, 1), (2, 1),
+        ]
+
+        # and the search index has them merged too
+        assert connection.exec_driver_sql(
+            "SELECT rowid FROM videos_fts WHERE videos_fts MATCH 'dance' ORDER BY rowid").fetchall() == [(1,), (2,)]
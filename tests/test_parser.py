@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from christina.video import parser
+from christina.video.parser import VideoInfo, read_parsers
+from christina.video.parsers import iwara
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+IWARA_URL = 'https://ecchi.iwara.tv/videos/pk4kmf7vrecjd9qmo'
+
+
+def test_iwara():
+    html = (FIXTURES / 'iwara_video.html').read_text()
+
+    assert iwara.parse(IWARA_URL, html) == VideoInfo(
+        src_url=IWARA_URL,
+        url='https://galaco.iwara.tv/file.php?expire=1612634059&hash=71c6e02e2958ea9ddc8e0fa708f640bd20acf118'
+            '&file=2021%2F01%2F09%2F1610163870_No7lRIgR5YFp5vlpJ_Source.mp4&op=dl&r=0',
+        ext='mp4',
+        title='Tda Miku - Happy Halloween',
+        thumb_url='https://i.iwara.tv/sites/default/files/videos/thumbnails/2233034/thumbnail-2233034_0004.jpg',
+        thumb_ext='jpg',
+        uploaded_time=1610163870,
+        creator_name='artypencil',
+        creator_url='https://ecchi.iwara.tv/users/artypencil',
+    )
+
+    assert parser.parse_video_page('i', IWARA_URL, html) == iwara.parse(IWARA_URL, html)
+
+
+def test_iwara_without_source():
+    with pytest.raises(ValueError):
+        iwara.parse(IWARA_URL, '<html><body><div class="node-info"></div></body></html>')
+
+
+def test_unknown_type():
+    with pytest.raises(TypeError):
+        parser.parse_video_page('x', IWARA_URL, '')
+
+
+def test_read_parsers():
+    assert read_parsers('') == {}
+    assert read_parsers('y  mysite.parsers.y\n\n z other.z \nbroken\na b c\n') == {
+        'y': 'mysite.parsers.y',
+        'z': 'other.z',
+    }
@@ -0,0 +1,113 @@
+from typing import Dict, List
+
+import pytest
+
+from christina.db import get_db_ctx
+from christina.net import downloader, store
+from christina.net.backend import Backend
+from christina.net.metrics import Metrics
+from christina.net.models import DownloadRecord
+from christina.net.pool import BackendPool, PoolMember
+from christina.net.registry import Downloadable, DownloadState, Registry
+from christina.net.scheduler import Scheduler
+
+
+class MemoryBackend(Backend):
+    def __init__(self, download_dir, states: Dict[str, str], failing: bool = False):
+        super().__init__(download_dir)
+
+        self.states = states
+        self.failing = failing
+
+    def update(self, gids, targets, speed_limit=0):
+        if self.failing:
+            raise ConnectionError('Failing on purpose.')
+
+        statuses = [{'id': gid, 'status': self.states.get(gid, 'removed')} for gid in gids]
+
+        return statuses, [ConnectionError('Not supported.') for _ in targets]
+
+
+class Emitter:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, *args):
+        self.events.append((event, *args))
+
+
+def create_pool(tmp_path, *members: MemoryBackend) -> BackendPool:
+    return BackendPool([PoolMember(member, 8, str(tmp_path)) for member in members])
+
+
+def delete_records():
+    with get_db_ctx() as db:
+        db.query(DownloadRecord).delete()
+
+
+@pytest.fixture
+def restore(tmp_path, monkeypatch):
+    delete_records()
+
+    monkeypatch.setattr(downloader, 'registry', Registry())
+    monkeypatch.setattr(downloader, 'scheduler', Scheduler(8, 2))
+    monkeypatch.setattr(downloader, 'metrics', Metrics())
+    monkeypatch.setattr(downloader, 'emitter', Emitter())
+
+    def restore(pool: BackendPool, gids: List[str]) -> Dict[str, Downloadable]:
+        store.save([
+            Downloadable(id=gid, url=f'http://127.0.0.1/{gid}', file=gid, name=gid, state=DownloadState.ADDED)
+            for gid in gids
+        ])
+
+        monkeypatch.setattr(downloader, 'backend', pool)
+        downloader.restore()
+
+        return {target.name: target for target in downloader.registry.get_registered()}
+
+    yield restore
+
+    delete_records()
+
+
+def test_statuses_in_request_order(tmp_path):
+    pool = create_pool(tmp_path, MemoryBackend(tmp_path, {'x': 'active'}), MemoryBackend(tmp_path, {'y': 'complete'}))
+
+    statuses = pool.tell_status(['1-y', 'unknown', '0-x'])
+
+    assert [(status['id'], status['status']) for status in statuses] == [
+        ('1-y', 'complete'), ('unknown', 'removed'), ('0-x', 'active'),
+    ]
+
+
+def test_restore_matches_statuses_by_gid(tmp_path, restore):
+    pool = create_pool(tmp_path, MemoryBackend(tmp_path, {'a': 'complete'}), MemoryBackend(tmp_path, {'b': 'active'}))
+
+    registered = restore(pool, ['1-b', '0-a'])
+
+    assert list(registered) == ['1-b']
+    assert registered['1-b'].id == '1-b'
+
+    [(event, loaded)] = downloader.emitter.events
+
+    assert event == 'loaded'
+    assert [target.id for target in loaded] == ['0-a']
+
+
+def test_restore_with_failed_member(tmp_path, restore):
+    pool = create_pool(
+        tmp_path,
+        MemoryBackend(tmp_path, {'a': 'complete', 'c': 'active'}),
+        MemoryBackend(tmp_path, {'b': 'complete'}, failing=True),
+    )
+
+    registered = restore(pool, ['1-b', '0-a', '0-c'])
+
+    # the status of 1-b is unknown, it keeps its gid until the member answers again
+    assert sorted(registered) == ['0-c', '1-b']
+    assert registered['1-b'].id == '1-b'
+    assert downloader.registry.get_queued() == []
+
+    [(event, loaded)] = downloader.emitter.events
+
+    assert [target.id for target in loaded] == ['0-a']
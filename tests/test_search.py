@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from christina.db import get_db_ctx
+from christina.server.server import app
+from christina.video import crud, models, schemas
+
+client = TestClient(app)
+
+TITLES = ['初音ミクのダンス', 'Happy Halloween', 'ミクさん']
+
+
+@pytest.fixture(scope='module')
+def videos():
+    with get_db_ctx() as db:
+        ids = [
+            crud.create_video(db, schemas.VideoBase(type='i', title=title, uploaded=datetime.now())).id
+            for title in TITLES
+        ]
+
+    yield dict(zip(TITLES, ids))
+
+    with get_db_ctx() as db:
+        db.query(models.Video).filter(models.Video.id.in_(ids)).delete(synchronize_session=False)
+
+
+@pytest.mark.parametrize('search, titles', [
+    ('ダンス', ['初音ミクのダンス']),
+    ('ミク', ['初音ミクのダンス', 'ミクさん']),
+    ('ミク ダンス', ['初音ミクのダンス']),
+    ('ween', ['Happy Halloween']),
+    ('HAPPY hal', ['Happy Halloween']),
+    ('ダンスを', []),
+])
+def test_search_substrings(videos, search, titles):
+    response = client.get('/videos', params={'search': search, 'fields': 'title'})
+
+    assert response.status_code == 200
+    assert sorted(video['title'] for video in response.json()['list']) == sorted(titles)
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import socket
+from threading import Event
+
+import pytest
+
+from christina.net import segmented
+from christina.net.backend import Backend
+from christina.net.registry import Downloadable
+from christina.net.segmented import HTTPBackend, HTTPDownload
+from file_server import FileServer
+
+SIZE = 64 * 1024
+
+
+@pytest.fixture
+def data():
+    return os.urandom(SIZE)
+
+
+@pytest.fixture
+def server(data):
+    server = FileServer(data)
+    server.start()
+
+    yield server
+
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    # split even the small test file
+    monkeypatch.setattr(segmented, 'MIN_SEGMENT_SIZE', SIZE // 8)
+
+
+def test_backend_requires_update(tmp_path):
+    class IncompleteBackend(Backend):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend(tmp_path)
+
+
+def test_segmented_download(tmp_path, server, data):
+    backend = HTTPBackend(tmp_path, connections=4)
+
+    done = Event()
+    backend.on_notify = lambda gid: done.set()
+    backend.start()
+
+    statuses, added = backend.update([], [Downloadable(url=server.url, file='vid/file.bin', name='file')])
+
+    assert statuses == []
+    assert done.wait(10)
+
+    [status], _ = backend.update(added, [])
+
+    assert status['status'] == 'complete'
+    assert status['completedLength'] == str(SIZE)
+    assert (tmp_path / 'vid/file.bin').read_bytes() == data
+
+    # the probe, then one request per segment
+    assert server.ranges[0] == 'bytes=0-'
+    assert sorted(server.ranges[1:], key=lambda range: int(range[6:].split('-')[0])) == [
+        f'bytes={start}-{start + SIZE // 4 - 1}' for start in range(0, SIZE, SIZE // 4)
+    ]
+
+    assert not (tmp_path / 'vid/file.bin.part').exists()
+    assert not (tmp_path / 'vid/file.bin.part.json').exists()
+
+
+def test_resume(tmp_path, server, data):
+    path = tmp_path / 'file.bin'
+    half = SIZE // 2
+
+    # the first segment is done and the second one has stopped halfway, as saved before a restart
+    with open(path.with_name('file.bin.part'), 'wb') as f:
+        f.write(data[:half + half // 2] + bytes(SIZE - half - half // 2))
+
+    with open(path.with_name('file.bin.part.json'), 'w') as f:
+        json.dump({'url': server.url, 'total': SIZE, 'segments': [[0, half, half], [half, SIZE, half // 2]]}, f)
+
+    download = HTTPDownload('gid', server.url, path, proxy=None, connections=2, speed_limit=0)
+    asyncio.run(download.run())
+
+    assert download.status == 'complete', download.error
+    assert path.read_bytes() == data
+
+    # only the rest of the unfinished segment is requested
+    assert server.ranges == ['bytes=0-', f'bytes={half + half // 2}-{SIZE - 1}']
+
+
+def test_without_ranges(tmp_path, data):
+    server = FileServer(data, accept_ranges=False)
+    server.start()
+
+    try:
+        path = tmp_path / 'file.bin'
+
+        download = HTTPDownload('gid', server.url, path, proxy=None, connections=4, speed_limit=0)
+        asyncio.run(download.run())
+
+        assert download.status == 'complete', download.error
+        assert path.read_bytes() == data
+        assert server.ranges == ['bytes=0-']
+    finally:
+        server.stop()
+
+
+def test_silent_server(tmp_path):
+    # connections are accepted by the kernel, and never answered
+    with socket.create_server(('127.0.0.1', 0)) as silent:
+        url = f'http://127.0.0.1:{silent.getsockname()[1]}/file.bin'
+
+        download = HTTPDownload('gid', url, tmp_path / 'file.bin', proxy=None, connections=4, speed_limit=0,
+                                timeout=0.2)
+        asyncio.run(asyncio.wait_for(download.run(), 5))
+
+    assert download.status == 'error'
+    assert 'Timed out' in download.error
+
+
+def test_stalled_segment_is_retried(tmp_path, data):
+    server = FileServer(data, stalls=1)
+    server.start()
+
+    try:
+        path = tmp_path / 'file.bin'
+
+        download = HTTPDownload('gid', server.url, path, proxy=None, connections=4, speed_limit=0, timeout=0.2)
+        asyncio.run(asyncio.wait_for(download.run(), 10))
+
+        assert download.status == 'complete', download.error
+        assert path.read_bytes() == data
+
+        # the probe, the four segments and the retry of the stalled one
+        assert len(server.ranges) == 6
+    finally:
+        server.stop()
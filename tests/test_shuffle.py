@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from christina.db import get_db_ctx
+from christina.video import crud, models, schemas
+from christina.video.shuffle import random_index
+
+
+@pytest.fixture
+def video_id():
+    with get_db_ctx() as db:
+        id = crud.create_video(db, schemas.VideoBase(type='i', title='random', uploaded=datetime.now())).id
+        tag_id = crud.create_tag(db, 'random tag').id
+
+    yield id
+
+    with get_db_ctx() as db:
+        db.execute(models.video_tag_table.delete().where(models.video_tag_table.c.video_id == id))
+        db.query(models.Video).filter_by(id=id).delete()
+        db.query(models.Tag).filter_by(id=tag_id).delete()
+
+
+def refresh():
+    with get_db_ctx() as db:
+        crud.refresh_random_index(db)
+
+    assert not random_index.stale
+
+
+def test_unrelated_changes_keep_index(video_id):
+    refresh()
+
+    with get_db_ctx() as db:
+        crud.update_video(db, video_id, {'title': 'renamed', 'video_dl_url': 'http://127.0.0.1/test.mp4'})
+
+    with get_db_ctx() as db:
+        tag = db.query(models.Tag).filter_by(name='random tag').one()
+        crud.add_video_tag(db, video_id, tag.id)
+
+    assert not random_index.stale
+
+
+@pytest.mark.parametrize('items', [
+    {'rating': 4},
+    {'video_dl_id': 'gid'},
+    {'deleted': True},
+])
+def test_candidate_changes_reload_index(video_id, items):
+    refresh()
+    assert video_id in random_index.get_pool(None)
+
+    with get_db_ctx() as db:
+        crud.update_video(db, video_id, items)
+
+    assert random_index.stale
+
+    refresh()
+
+    if 'rating' in items:
+        assert video_id in random_index.get_pool(4)
+    else:
+        assert video_id not in random_index.get_pool(None)
+
+
+def test_bulk_update_reloads_index(video_id):
+    refresh()
+
+    with get_db_ctx() as db:
+        crud.update_videos(db, [video_id], {'title': 'renamed'})
+
+    assert not random_index.stale
+
+    with get_db_ctx() as db:
+        crud.update_videos(db, [video_id], {'rating': 2})
+
+    assert random_index.stale
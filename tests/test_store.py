@@ -0,0 +1,61 @@
+from threading import Thread
+from time import sleep
+
+import pytest
+from sqlalchemy.orm import Session
+
+from christina.db import Writer, get_db_ctx
+from christina.net import store
+from christina.net.models import DownloadRecord
+from christina.net.registry import Downloadable, DownloadState
+
+
+def delete_records():
+    with get_db_ctx() as db:
+        db.query(DownloadRecord).delete()
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    delete_records()
+    yield
+    delete_records()
+
+
+def fail(db: Session):
+    raise RuntimeError('Failing on purpose.')
+
+
+def test_save_survives_failed_batch(monkeypatch):
+    # slow enough for both jobs to land in the same batch
+    writer = Writer(max_delay=0.5)
+    monkeypatch.setattr(store, 'writer', writer)
+
+    targets = [Downloadable(url=f'http://127.0.0.1/{i}', file=f'{i}.mp4', name=str(i)) for i in range(3)]
+
+    saving = Thread(target=store.save, args=(targets,))
+    saving.start()
+
+    sleep(0.1)
+    failed = writer.submit(fail)
+
+    saving.join(5)
+
+    with pytest.raises(RuntimeError):
+        failed.result(5)
+
+    loaded = store.load()
+
+    assert [target.url for target in loaded] == [target.url for target in targets]
+    assert [target.record_id for target in loaded] == [target.record_id for target in targets]
+
+    # the saved targets are updated in place from now on
+    for target in targets:
+        target.id = f'gid{target.record_id}'
+        target.state = DownloadState.ADDED
+
+    store.save(targets)
+
+    assert [(target.id, target.state) for target in store.load()] == [
+        (target.id, DownloadState.ADDED) for target in targets
+    ]
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from christina.db import get_db_ctx
+from christina.server.server import app
+from christina.video import crud, models, schemas
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope='module')
+def video_ids():
+    with get_db_ctx() as db:
+        videos = [
+            crud.create_video(db, schemas.VideoBase(type='i', title=f'video {i}', uploaded=datetime.now()))
+            for i in range(3)
+        ]
+        ids = [video.id for video in videos]
+
+    yield ids
+
+    with get_db_ctx() as db:
+        db.query(models.Video).filter(models.Video.id.in_(ids)).delete(synchronize_session=False)
+
+
+def test_videos_by_ids(video_ids):
+    response = client.get('/videos', params={'ids': ','.join(map(str, video_ids)), 'fields': 'title'})
+
+    assert response.status_code == 200
+    assert [video['id'] for video in response.json()['list']] == video_ids
+
+
+@pytest.mark.parametrize('params', [
+    {'ids': 'a,b'},
+    {'ids': ','.join(map(str, range(1, crud.MAX_BATCH_SIZE + 2)))},
+    {'fields': 'title,password'},
+    {'tag': '1,x'},
+    {'order': 'password'},
+    {'order': 'chars'},
+    {'order': '-creator'},
+    {'order': '__tablename__'},
+    {'cursor': 'not a cursor', 'order': 'created'},
+])
+def test_invalid_video_list(params):
+    assert client.get('/videos', params=params).status_code == 400
+
+
+@pytest.mark.parametrize('order', ['rating', '-created', 'title'])
+def test_video_list_order(video_ids, order):
+    assert client.get('/videos', params={'order': order}).status_code == 200
+
+
+def test_bulk_update(video_ids):
+    first, second, _ = video_ids
+
+    response = client.patch('/videos', json={'ids': [first, 0], 'update': {'rating': 3}})
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json()] == ['updated', 'not_found']
+
+    response = client.patch('/videos', json={'ids': [first, second], 'update': {'rating': 3}})
+
+    assert [result['status'] for result in response.json()] == ['unchanged', 'updated']
+
+
+@pytest.mark.parametrize('body', [
+    {'ids': [1], 'update': {'rating': None}},
+    {'ids': [1], 'update': {}},
+    {'ids': list(range(1, crud.MAX_BATCH_SIZE + 2)), 'update': {'rating': 1}},
+])
+def test_invalid_bulk_update(body):
+    assert client.patch('/videos', json=body).status_code == 422
+
+
+@pytest.mark.parametrize('path', ['/tags/videos', '/chars/videos'])
+@pytest.mark.parametrize('body', [
+    {'video_ids': [1], 'add': [1], 'remove': [1]},
+    {'video_ids': list(range(1, crud.MAX_BATCH_SIZE + 2)), 'add': [1]},
+])
+def test_invalid_links_update(path, body):
+    assert client.patch(path, json=body).status_code == 422
+
+
+@pytest.mark.parametrize('path', ['/tags/videos', '/chars/videos'])
+def test_links_update(path, video_ids):
+    response = client.patch(path, json={'video_ids': video_ids[:1], 'add': [0]})
+
+    assert response.status_code == 200
+    assert response.json() == [{'video_id': video_ids[0], 'id': 0, 'status': 'not_found'}]